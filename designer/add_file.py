@@ -72,7 +72,7 @@ class AddFileDialog(BoxLayout):
                     self.text_folder.text)
 
             self.proj_loader.proj_watcher.start_watching(
-                self.proj_loader.proj_dir)
+                self.proj_loader.proj_dir, self.proj_loader.proj_excludes)
             self.dispatch('on_added')
 
         except (OSError, IOError):
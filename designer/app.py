@@ -5,6 +5,7 @@ import time
 import os
 import shutil
 import traceback
+from functools import partial
 
 kivy.require('1.9.0')
 from kivy.app import App
@@ -156,6 +157,8 @@ class Designer(FloatLayout):
         self.project_loader = ProjectLoader(self.project_watcher)
         self.recent_manager = RecentManager()
         self.widget_to_paste = None
+        self._project_changes = None
+        self._save_needs_reload = False
         self.designer_content = DesignerContent(size_hint=(1, None))
 
         self.designer_settings = DesignerSettings()
@@ -167,10 +170,24 @@ class Designer(FloatLayout):
             self.project_loader.perform_auto_save,
             int(self.designer_settings.config_parser.getdefault(
                 'global', 'auto_save_time', 5)) * 60)
+        self._set_undo_limits()
+        self.project_watcher.delay = \
+            float(self.designer_settings.config_parser.getdefault(
+                'global', 'watcher_delay', 0.5))
 
         Window.bind(on_resize=self._write_window_size)
         Window.bind(on_request_close=self.on_request_close)
 
+    def _set_undo_limits(self):
+        '''To set the limits of the undo history from the settings.
+        '''
+        config_parser = self.designer_settings.config_parser
+        self.undo_manager.set_limits(
+            max_entries=int(config_parser.getdefault(
+                'global', 'undo_max_entries', 100)),
+            max_size=int(config_parser.getdefault(
+                'global', 'undo_max_size', 16384)) * 1024)
+
     def _write_window_size(self, *_):
         '''Write updated window size to config
         '''
@@ -226,10 +243,23 @@ class Designer(FloatLayout):
             bool(self.designer_settings.config_parser.getdefault(
                  'global', 'reload_kv', True))
 
+        self.ui_creator.kv_code_input.incremental_reload = \
+            bool(int(self.designer_settings.config_parser.getdefault(
+                'global', 'incremental_reload', 1)))
+
+        self.project_loader.lazy_import = \
+            bool(int(self.designer_settings.config_parser.getdefault(
+                'global', 'lazy_import', 1)))
+
         self.recent_manager.max_recent_files = \
             int(self.designer_settings.config_parser.getdefault(
                 'global', 'num_recent_files', 5))
 
+        self._set_undo_limits()
+        self.project_watcher.delay = \
+            float(self.designer_settings.config_parser.getdefault(
+                'global', 'watcher_delay', 0.5))
+
         if self.save_window_size:
             self._write_window_size()
 
@@ -281,10 +311,18 @@ class Designer(FloatLayout):
 
             self.designer_content.y = self.statusbar.height
 
-    def project_modified(self, *args):
-        '''Event Handler called when Project is modified outside Kivy Designer
+    def project_modified(self, changes):
+        '''Event Handler called when Project is modified outside Kivy Designer.
+           changes is the :class:`~designer.proj_watcher.ProjectChanges`
+           made to the project.
         '''
 
+        # Changes made until the project is reloaded are reloaded together
+        if self._project_changes is None:
+            self._project_changes = changes
+        else:
+            self._project_changes.update(changes)
+
         # To dispatch modified event only once for all files/folders of proj_dir
         if self._proj_modified_outside:
             return
@@ -307,11 +345,70 @@ class Designer(FloatLayout):
 
         # Perform reload of project after it is modified
         self._popup.dismiss()
-        self.project_watcher.allow_event_dispatch = False
-        self._perform_open(self.project_loader.proj_dir)
-        self.project_watcher.allow_event_dispatch = True
+        changes = self._project_changes
+        self._project_changes = None
+        if changes is None or not self._hot_reload(changes):
+            self._perform_open(self.project_loader.proj_dir)
+
         self._proj_modified_outside = False
 
+    def _hot_reload(self, changes):
+        '''To reload only the kv files and the modules changed by changes,
+           keeping the selected widget, the opened files and, unless the kv
+           text has changed, the undo history. Returns False if the whole
+           project has to be opened again.
+        '''
+
+        project_loader = self.project_loader
+        playground = self.ui_creator.playground
+        reloaded = None
+        playground.sandbox.error_active = True
+        with playground.sandbox:
+            try:
+                reloaded = project_loader.hot_reload(changes)
+
+            except Exception:
+                reloaded = None
+
+        playground.sandbox.error_active = False
+        if reloaded is None:
+            return False
+
+        if reloaded['class_rules']:
+            self.designer_content.toolbox.cleanup()
+            project_loader.widget_classifier.remove_custom()
+            if project_loader.class_rules:
+                project_loader.widget_classifier.add_custom(
+                    project_loader.class_rules)
+                self.designer_content.toolbox.add_custom()
+
+        if reloaded['kv'] or reloaded['modules']:
+            kv_code_input = self.ui_creator.kv_code_input
+            text = project_loader.get_full_str()
+            if text != kv_code_input.text:
+                # Recorded changes apply to the replaced text
+                self.undo_manager.cleanup()
+
+            kv_code_input.load_text(text, full_reload=reloaded['modules'])
+
+        # Opened files are reloaded unless they have been modified
+        paths = set(os.path.normpath(path)
+                    for path in changes.get_paths('modified'))
+        tab_pannel = self.designer_content.tab_pannel
+        for code_input in tab_pannel.list_py_code_inputs:
+            path = os.path.normpath(os.path.join(project_loader.proj_dir,
+                                                 code_input.rel_file_path))
+            if path not in paths or code_input.is_dirty():
+                continue
+
+            f = open(path, 'r')
+            code_input.text = f.read()
+            f.close()
+            code_input.saved_text = code_input.text
+
+        self.statusbar.show_message('Project reloaded')
+        return True
+
     def on_show_edit(self, *args):
         '''Event Handler of 'on_show_edit' event. This will show EditContView
            in ActionBar
@@ -473,9 +570,8 @@ class Designer(FloatLayout):
             self.designer_content.update_tree_view(self.project_loader)
             self._add_designer_content()
             if self.project_loader.class_rules:
-                for i, _rule in enumerate(self.project_loader.class_rules):
-                    widgets.append((_rule.name, 'custom'))
-
+                self.project_loader.widget_classifier.add_custom(
+                    self.project_loader.class_rules)
                 self.designer_content.toolbox.add_custom()
 
         self.ui_creator.playground.sandbox.error_active = False
@@ -493,11 +589,11 @@ class Designer(FloatLayout):
         for node in self.proj_tree_view.root.nodes[:]:
             self.proj_tree_view.remove_node(node)
 
-        for widget in widgets[:]:
-            if widget[1] == 'custom':
-                widgets.remove(widget)
+        self.project_loader.widget_classifier.remove_custom()
 
         self._curr_proj_changed = False
+        self._project_changes = None
+        self._save_needs_reload = False
         self.ui_creator.kv_code_input.text = ""
 
         self.designer_content.tab_pannel.list_py_code_inputs = []
@@ -617,9 +713,7 @@ class Designer(FloatLayout):
         '''To open a project given by file_path
         '''
 
-        for widget in widgets[:]:
-            if widget[1] == 'custom':
-                widgets.remove(widget)
+        self.project_loader.widget_classifier.remove_custom()
 
         self.cleanup()
 
@@ -632,9 +726,8 @@ class Designer(FloatLayout):
                 self.project_loader.load_project(file_path)
 
                 if self.project_loader.class_rules:
-                    for i, _rule in enumerate(self.project_loader.class_rules):
-                        widgets.append((_rule.name, 'custom'))
-
+                    self.project_loader.widget_classifier.add_custom(
+                        self.project_loader.class_rules)
                     self.designer_content.toolbox.add_custom()
 
                 # to test listview
@@ -694,20 +787,59 @@ class Designer(FloatLayout):
                     return
 
                 else:
-                    self.project_loader.save_project()
-                    projdir = self.project_loader.proj_dir
-                    self.project_loader.cleanup(stop_watcher=False)
-                    self.ui_creator.playground.cleanup()
-                    self.project_loader.load_project(projdir)
-                    root_wigdet = self.project_loader.get_root_widget()
-                    self.ui_creator.playground.add_widget_to_parent(
-                        root_wigdet, None, from_undo=True, from_kv=True)
-                self._curr_proj_changed = False
-                self.statusbar.show_message('Project saved successfully')
+                    self.statusbar.show_message('Saving project...')
+                    self.project_loader.save_project(
+                        on_success=self._on_project_saved,
+                        on_failure=self._on_project_save_failed)
+
+            except ProjectLoaderException as e:
+                self.statusbar.show_message('Cannot save project: %s' %
+                                            (str(e)))
 
             except:
                 self.statusbar.show_message('Cannot save project')
 
+    def _on_project_saved(self, needs_reload=True, modified=False):
+        '''Called by ProjectLoader once the project has been written. It
+           reloads the project if its py files or its root widget have
+           changed. If the project has been modified while it was being
+           saved then it is still marked as changed and it is reloaded by
+           the next save instead, so that the modifications are kept.
+        '''
+
+        if modified:
+            self._save_needs_reload = self._save_needs_reload or needs_reload
+            self.statusbar.show_message('Project saved, it has been '
+                                        'modified while being saved')
+            return
+
+        needs_reload = needs_reload or self._save_needs_reload
+        self._save_needs_reload = False
+        if not needs_reload:
+            self._curr_proj_changed = False
+            self.statusbar.show_message('Project saved successfully')
+            return
+
+        try:
+            projdir = self.project_loader.proj_dir
+            self.project_loader.cleanup(stop_watcher=False)
+            self.ui_creator.playground.cleanup()
+            self.project_loader.load_project(projdir)
+            root_wigdet = self.project_loader.get_root_widget()
+            self.ui_creator.playground.add_widget_to_parent(
+                root_wigdet, None, from_undo=True, from_kv=True)
+            self._curr_proj_changed = False
+            self.statusbar.show_message('Project saved successfully')
+
+        except:
+            self.statusbar.show_message('Cannot save project')
+
+    def _on_project_save_failed(self, error):
+        '''Called by ProjectLoader if the project couldn't be written.
+        '''
+
+        self.statusbar.show_message('Cannot save project: %s' % (str(error)))
+
     def action_btn_save_as_pressed(self, *args):
         '''Event Handler when ActionButton "Save As" is pressed.
         '''
@@ -751,7 +883,24 @@ class Designer(FloatLayout):
 
         proj_dir = os.path.join(proj_dir, instance.filename)
         try:
-            self.project_loader.save_project(proj_dir)
+            self.statusbar.show_message('Saving project...')
+            self.project_loader.save_project(
+                proj_dir,
+                on_success=partial(self._on_project_saved_as, proj_dir),
+                on_failure=self._on_project_save_failed)
+
+        except ProjectLoaderException as e:
+            self.statusbar.show_message('Cannot save project: %s' % (str(e)))
+
+        except:
+            self.statusbar.show_message('Cannot save project')
+
+    def _on_project_saved_as(self, proj_dir, *args):
+        '''Called by ProjectLoader once the project has been written to
+           proj_dir. It reloads the project from there.
+        '''
+
+        try:
             self.recent_manager.add_file(proj_dir)
             projdir = self.project_loader.proj_dir
             self.project_loader.cleanup()
@@ -838,6 +987,8 @@ class Designer(FloatLayout):
     def _perform_quit(self, *args):
         '''Perform Application qui.Application
         '''
+        # Let files being saved be written completely
+        self.project_loader.save_worker.wait()
         App.get_running_app().stop()
 
     def action_btn_undo_pressed(self, *args):
@@ -982,8 +1133,8 @@ class Designer(FloatLayout):
                 self.project_loader.add_custom_widget(file_path)
 
                 self.designer_content.toolbox.cleanup()
-                for _rule in (self.project_loader.custom_widgets):
-                    widgets.append((_rule.name, 'custom'))
+                self.project_loader.widget_classifier.add_custom(
+                    self.project_loader.custom_widgets)
 
                 self.designer_content.toolbox.add_custom()
 
@@ -1298,12 +1449,23 @@ class DesignerApp(App):
             self.root.ui_creator.kv_code_input
         self.root.project_loader.tab_pannel = \
             self.root.designer_content.tab_pannel
+        self.root.project_loader.statusbar = self.root.statusbar
         self.root.ui_creator.playground.undo_manager = self.root.undo_manager
         self.root.ui_creator.kv_code_input.project_loader = \
             self.root.project_loader
         self.root.ui_creator.kv_code_input.statusbar = self.root.statusbar
+        self.root.ui_creator.kv_code_input.incremental_reload = \
+            bool(int(self.root.designer_settings.config_parser.getdefault(
+                'global', 'incremental_reload', 1)))
+        self.root.project_loader.lazy_import = \
+            bool(int(self.root.designer_settings.config_parser.getdefault(
+                'global', 'lazy_import', 1)))
         self.root.ui_creator.widgettree.project_loader = \
             self.root.project_loader
+        self.root.ui_creator.propertyviewer.project_loader = \
+            self.root.project_loader
+        self.root.designer_content.toolbox.project_loader = \
+            self.root.project_loader
         self.root.ui_creator.eventviewer.project_loader = \
             self.root.project_loader
         self.root.ui_creator.eventviewer.designer_tabbed_panel = \
@@ -1389,7 +1551,7 @@ class DesignerApp(App):
             self._widget_focused = []
 
         self.widget_focused = widget
-        self.root.ui_creator.widgettree.refresh()
+        self.root.ui_creator.widgettree.select_widget(widget)
 
         if not widget:
             return
@@ -0,0 +1,183 @@
+'''This module contains AutoSave, the journal used by ProjectLoader to
+   auto save the project. Only the buffers whose text has changed since
+   they were last saved are written to the journal, files of the project
+   are never copied. A manifest lists, for each file, the blob holding its
+   latest text, so that the latest state can be recovered.
+'''
+
+import os
+import json
+import time
+import shutil
+
+from designer.kv_cache import get_content_hash
+from designer.helper_functions import write_atomic
+
+AUTO_SAVE_DIR = os.path.join('.designer', 'auto_save')
+'''Path of the directory of the journal relative to project's directory.
+'''
+
+MANIFEST_FILE_NAME = 'manifest.json'
+'''Name of the manifest file in :data:`AUTO_SAVE_DIR`.
+'''
+
+AUTO_SAVE_VERSION = 1
+'''Version of the manifest format.
+'''
+
+
+class AutoSave(object):
+    '''AutoSave is the auto save journal of the project in proj_dir. Each
+       saved text is stored in a blob named by the hash of its content and
+       the manifest maps the path, relative to proj_dir, of each file to
+       the hash of its latest text.
+    '''
+
+    def __init__(self, proj_dir):
+        super(AutoSave, self).__init__()
+        self.proj_dir = proj_dir
+        self.path = os.path.join(proj_dir, AUTO_SAVE_DIR)
+        self.entries = {}
+        self.seq = 0
+        self._disk_hashes = {}
+        self._loaded = False
+
+    def load(self):
+        '''To load the manifest of the journal. Returns False if there is
+           no valid manifest.
+        '''
+
+        self._loaded = True
+        self.entries = {}
+        self.seq = 0
+        try:
+            f = open(os.path.join(self.path, MANIFEST_FILE_NAME), 'r')
+            data = json.load(f)
+            f.close()
+        except (IOError, ValueError):
+            return False
+
+        if not isinstance(data, dict) or \
+                data.get('version') != AUTO_SAVE_VERSION:
+            return False
+
+        self.entries = data.get('files', {})
+        self.seq = data.get('seq', 0)
+        return True
+
+    def _get_disk_hash(self, rel_path):
+        '''Returns the hash of the content of rel_path on disk, None if it
+           doesn't exist.
+        '''
+
+        if rel_path not in self._disk_hashes:
+            try:
+                f = open(os.path.join(self.proj_dir, rel_path), 'rb')
+                self._disk_hashes[rel_path] = get_content_hash(f.read())
+                f.close()
+            except IOError:
+                self._disk_hashes[rel_path] = None
+
+        return self._disk_hashes[rel_path]
+
+    def get_changed(self, buffers):
+        '''Returns the dict of the buffers, from buffers which maps the
+           path of each file relative to proj_dir to its text, whose text
+           differs from the last saved one, with their hash.
+        '''
+
+        if not self._loaded:
+            self.load()
+
+        changed = {}
+        for rel_path, text in buffers.items():
+            text_hash = get_content_hash(text)
+            entry = self.entries.get(rel_path)
+            if entry is not None:
+                if entry['hash'] == text_hash:
+                    continue
+            elif self._get_disk_hash(rel_path) == text_hash:
+                continue
+
+            changed[rel_path] = (text, text_hash)
+
+        return changed
+
+    def save(self, buffers):
+        '''To write the buffers which have changed since they were last
+           saved to the journal. Returns the list of their paths.
+        '''
+
+        changed = self.get_changed(buffers)
+        if not changed:
+            return []
+
+        blobs_dir = os.path.join(self.path, 'blobs')
+        if not os.path.exists(blobs_dir):
+            # Journal may contain a full copy of project written by a
+            # previous version
+            if os.path.exists(self.path):
+                shutil.rmtree(self.path)
+            os.makedirs(blobs_dir)
+
+        for rel_path, (text, text_hash) in changed.items():
+            blob = os.path.join(blobs_dir, text_hash)
+            if not os.path.exists(blob):
+                write_atomic(blob, text)
+
+            self.seq += 1
+            self.entries[rel_path] = {'hash': text_hash, 'seq': self.seq,
+                                      'time': time.time()}
+
+        self._write_manifest()
+        self._remove_unused_blobs()
+        return list(changed.keys())
+
+    def _write_manifest(self):
+        write_atomic(os.path.join(self.path, MANIFEST_FILE_NAME),
+                     json.dumps({'version': AUTO_SAVE_VERSION,
+                                 'seq': self.seq, 'files': self.entries},
+                                indent=1, sort_keys=True))
+
+    def _remove_unused_blobs(self):
+        blobs_dir = os.path.join(self.path, 'blobs')
+        used = set(entry['hash'] for entry in self.entries.values())
+        for blob in os.listdir(blobs_dir):
+            if blob not in used:
+                os.remove(os.path.join(blobs_dir, blob))
+
+    def clear(self):
+        '''To empty the journal, it is called once the project has been
+           saved.
+        '''
+
+        self.entries = {}
+        self.seq = 0
+        self._disk_hashes = {}
+        self._loaded = True
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+
+    def recover(self, dest_dir=None):
+        '''To rebuild the latest auto saved state. Returns a dict of the
+           path of each journaled file relative to proj_dir to its text.
+           If dest_dir is given then the files are also written in it,
+           at the same relative paths.
+        '''
+
+        if not self._loaded:
+            self.load()
+
+        texts = {}
+        for rel_path, entry in self.entries.items():
+            f = open(os.path.join(self.path, 'blobs', entry['hash']), 'rb')
+            texts[rel_path] = f.read().decode('utf-8')
+            f.close()
+
+            if dest_dir:
+                path = os.path.join(dest_dir, rel_path)
+                if not os.path.exists(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+                write_atomic(path, texts[rel_path])
+
+        return texts
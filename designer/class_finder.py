@@ -0,0 +1,119 @@
+'''This module is used by ProjectLoader to know which classes are defined
+   in the python files of a project, and which of them is the App class,
+   without importing them. Each file is read and parsed only once and
+   files are parsed by a pool of threads.
+'''
+
+import re
+import ast
+
+from multiprocessing.pool import ThreadPool
+
+CLASS_FINDER_THREADS = 4
+'''Number of threads used by :func:`find_classes`.
+'''
+
+
+def find_app_class_in_string(s):
+    '''To find the App class defined in string s by searching it. Returns
+       'runTouchApp' if runTouchApp is used in s and None if s neither
+       defines an App nor uses runTouchApp. It is used when s cannot be
+       parsed.
+    '''
+
+    if 'runTouchApp' in s:
+        return 'runTouchApp'
+
+    elif 'kivy.app' in s:
+        for _class in re.findall(r'\bclass\b.+:', s):
+            b_index1 = _class.find('(')
+            b_index2 = _class.find(')')
+            if _class[b_index1 + 1:b_index2].strip() == 'App':
+                return _class[_class.find(' '):b_index1].strip()
+
+    return None
+
+
+def _get_name(node):
+    '''Returns the name referred by a Name or an Attribute node.
+    '''
+
+    if isinstance(node, ast.Name):
+        return node.id
+
+    elif isinstance(node, ast.Attribute):
+        return node.attr
+
+    return None
+
+
+def get_file_classes(s):
+    '''Returns a dict with the names of the top level classes defined in
+       string s as 'classes' and the App class defined or 'runTouchApp' if
+       runTouchApp is used in it as 'app_class'.
+    '''
+
+    try:
+        tree = ast.parse(s)
+    except (SyntaxError, TypeError, ValueError):
+        return {'classes': re.findall(r'\bclass\s+([\w_]+)', s),
+                'app_class': find_app_class_in_string(s)}
+
+    classes = []
+    app_class = None
+    kivy_app_imported = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == 'runTouchApp':
+            return {'classes': [_node.name for _node in tree.body
+                                if isinstance(_node, ast.ClassDef)],
+                    'app_class': 'runTouchApp'}
+
+        elif isinstance(node, ast.ImportFrom):
+            if node.module == 'kivy.app':
+                kivy_app_imported = True
+
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name == 'kivy.app':
+                    kivy_app_imported = True
+
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+
+        classes.append(node.name)
+        if app_class is None and \
+                'App' in [_get_name(base) for base in node.bases]:
+            app_class = node.name
+
+    if not kivy_app_imported:
+        app_class = None
+
+    return {'classes': classes, 'app_class': app_class}
+
+
+def _find_file_classes(path):
+    try:
+        f = open(path, 'r')
+        s = f.read()
+        f.close()
+    except IOError:
+        return path, {'classes': [], 'app_class': None}
+
+    return path, get_file_classes(s)
+
+
+def find_classes(paths):
+    '''Returns a dict of the result of :func:`get_file_classes` for the
+       content of each file of paths.
+    '''
+
+    if len(paths) < 2:
+        return dict(_find_file_classes(path) for path in paths)
+
+    pool = ThreadPool(min(CLASS_FINDER_THREADS, len(paths)))
+    try:
+        return dict(pool.map(_find_file_classes, paths))
+    finally:
+        pool.close()
+        pool.join()
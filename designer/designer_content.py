@@ -1,6 +1,9 @@
 import os
 
+from itertools import islice
+
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.uix.floatlayout import FloatLayout
 from kivy.factory import Factory
 from kivy.properties import ObjectProperty, ListProperty
@@ -8,6 +11,10 @@ from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
 from kivy.uix.treeview import TreeViewLabel
 from designer.uix.py_code_input import PyCodeInput, PyScrollView
 
+TREE_VIEW_BATCH_SIZE = 50
+'''Number of files inserted in the Project Tree per frame.
+'''
+
 
 class DesignerContent(FloatLayout):
     '''This class contains the body of the Kivy Designer. It contains,
@@ -51,15 +58,29 @@ class DesignerContent(FloatLayout):
 
     def update_tree_view(self, proj_loader):
         '''This function is used to insert all the py files detected.
-           as a node in the Project Tree.
+           as a node in the Project Tree. Files are inserted in batches of
+           TREE_VIEW_BATCH_SIZE, one batch per frame.
         '''
 
         self.proj_loader = proj_loader
 
         # Fill nodes with file and directories
         self._root_node = self.tree_view.root
-        for _file in proj_loader.file_list:
+        self._files_to_add = iter(proj_loader.file_list)
+        Clock.unschedule(self._add_files_batch)
+        self._add_files_batch()
+
+    def _add_files_batch(self, *args):
+        '''To insert the next batch of files in the Project Tree.
+        '''
+
+        count = 0
+        for _file in islice(self._files_to_add, TREE_VIEW_BATCH_SIZE):
             self.add_file_to_tree_view(_file)
+            count += 1
+
+        if count == TREE_VIEW_BATCH_SIZE:
+            Clock.schedule_once(self._add_files_batch)
 
     def add_file_to_tree_view(self, _file):
         '''This function is used to insert py file given by it's path argument
@@ -160,6 +181,7 @@ class DesignerTabbedPanel(TabbedPanel):
         _py_code_input = scroll.code_input
         _py_code_input.rel_file_path = rel_path
         _py_code_input.text = f.read()
+        _py_code_input.saved_text = _py_code_input.text
         _py_code_input.bind(
             on_show_edit=App.get_running_app().root.on_show_edit)
         f.close()
@@ -203,8 +203,9 @@ class EventViewer(PropertyViewer):
 
         add = self.prop_list.add_widget
         events = value.events()
+        handlers = self.kv_code_input.get_rule_values(value)
         for event in events:
-            ip = self.build_for(event)
+            ip = self.build_for(event, handlers.get(event, ''))
             if not ip:
                 continue
             add(EventLabel(text=event))
@@ -225,10 +226,10 @@ class EventViewer(PropertyViewer):
         '''
         # Find the python file of widget
         py_file = None
-        for rule in self.project_loader.class_rules:
-            if rule.name == type(self.widget).__name__:
-                py_file = rule.file
-                break
+        rule = self.project_loader.widget_classifier.get_rule(
+            type(self.widget).__name__)
+        if rule is not None:
+            py_file = rule.file
 
         # Open it in DesignerTabbedPannel
         rel_path = py_file.replace(self.project_loader.proj_dir, '')
@@ -290,12 +291,15 @@ class EventViewer(PropertyViewer):
             self.statusbar.show_message('New Event Created you must save '
                                         'project for changes to take effect')
 
-    def build_for(self, name):
+    def build_for(self, name, text=None):
         '''To create :class:`~designer.propertyviewer.PropertyBoolean`/
            :class:`~designer.propertyviewer.PropertyTextInput`
-           for Property 'name'
+           for Property 'name'. text is the handler of the event declared
+           in widget's rule, it is read from the rule if not given.
         '''
-        text = self.kv_code_input.get_property_value(self.widget, name)
+        if text is None:
+            text = self.kv_code_input.get_property_value(self.widget, name)
+
         return EventHandlerTextInput(
             kv_code_input=self.kv_code_input, eventname=name,
             eventwidget=self.widget, multiline=False, text=text,
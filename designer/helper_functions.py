@@ -3,9 +3,42 @@
 '''
 
 import os
+import stat
+import tempfile
 
 from kivy.app import App
 
+ATOMIC_TEMP_SUFFIX = '.kd-tmp'
+'''Suffix of the temporary files written by :func:`write_atomic`.
+'''
+
+# umask can only be read by setting it, which affects the whole process,
+# so it is read once, on the main thread when this module is imported
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+MOVEFILE_REPLACE_EXISTING = 0x1
+MOVEFILE_WRITE_THROUGH = 0x8
+
+
+def replace_file(src, dst):
+    '''To rename src to dst, replacing dst atomically if it exists.
+    '''
+
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+
+    elif os.name == 'nt':
+        # os.rename doesn't replace an existing file on Windows
+        import ctypes
+        if not ctypes.windll.kernel32.MoveFileExW(
+                unicode(src), unicode(dst),
+                MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH):
+            raise ctypes.WinError()
+
+    else:
+        os.rename(src, dst)
+
 
 def get_indent_str(indentation):
     '''Return a string consisting only indentation number of spaces
@@ -82,3 +115,39 @@ def get_kivy_designer_dir():
     if not os.path.exists(user_dir):
         os.makedirs(user_dir)
     return user_dir
+
+
+def write_atomic(path, content):
+    '''To write content to the file at path atomically. content is written
+       to a temporary file in the same directory, which then replaces path,
+       so that path is never left partially written. Unicode content is
+       encoded in utf-8.
+    '''
+
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+
+    _dir, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix='.' + name + '.',
+                                     suffix=ATOMIC_TEMP_SUFFIX,
+                                     dir=_dir or '.')
+    try:
+        f = os.fdopen(fd, 'wb')
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+
+        # mkstemp creates files readable only by the user
+        if os.path.exists(path):
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        else:
+            mode = 0o666 & ~_UMASK
+        os.chmod(temp_path, mode)
+
+        replace_file(temp_path, path)
+
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,183 @@
+'''This module contains HitIndex, the spatial index used by
+   :class:`~designer.playground.Playground` to find the widgets at a point.
+   The bounding boxes of the widgets, in window coordinates, are put in
+   the cells of a grid, so that the widgets at a point are found by looking
+   up a single cell instead of transforming the point and testing it
+   against every widget of the tree.
+
+   The index is built lazily, by the first lookup after it has been
+   discarded. It is discarded whenever the position, the size or the
+   children of an indexed widget, or of one of its parents, change.
+
+   While a widget is dragged it is added to and removed from its target on
+   every move, which moves its siblings. The index is frozen during the
+   drag, so that these changes of position don't discard it, and only
+   changes of the children of the tree do.
+'''
+
+from kivy.uix.widget import Widget
+from kivy.uix.scatter import Scatter
+
+CELL_SIZE = 64
+'''Size, in pixels, of the cells of the grid of :class:`HitIndex`.
+'''
+
+
+def get_window_box(widget):
+    '''Returns the bounding box of widget in window coordinates, as a
+       (x, y, right, top) tuple.
+    '''
+
+    x1, y1 = widget.to_window(widget.x, widget.y)
+    x2, y2 = widget.to_window(widget.right, widget.top)
+    return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+
+class HitIndex(object):
+    '''HitIndex indexes root and its descendants. The subtree of volatile,
+       the widget being dragged, isn't indexed because it is moved on
+       every touch move, it is tested directly by :meth:`get_hit`.
+    '''
+
+    def __init__(self, cell_size=CELL_SIZE):
+        super(HitIndex, self).__init__()
+        self.cell_size = cell_size
+        self.root = None
+        self.volatile = None
+        self.valid = False
+        self.frozen = False
+        self._dirty = False
+        self._cells = {}
+        self._children = {}
+        self._bindings = []
+
+    def _bind(self, widget, **kwargs):
+        widget.bind(**kwargs)
+        self._bindings.append((widget, kwargs))
+
+    def _unbind_all(self):
+        for widget, kwargs in self._bindings:
+            widget.unbind(**kwargs)
+
+        self._bindings = []
+
+    def invalidate(self, *args):
+        '''To discard the index, it is built again by the next lookup. If
+           the index is frozen then it is discarded only once it is thawed.
+        '''
+
+        if self.frozen:
+            self._dirty = True
+        else:
+            self.valid = False
+
+    def freeze(self):
+        '''To keep the index when the position or the size of the indexed
+           widgets change, until :meth:`thaw` is called.
+        '''
+
+        self.frozen = True
+
+    def thaw(self):
+        '''To stop keeping the index. It is discarded, along with volatile,
+           if the widgets have changed while it was frozen.
+        '''
+
+        self.frozen = False
+        if self._dirty or self.volatile is not None:
+            self._dirty = False
+            self.volatile = None
+            self.valid = False
+
+    def _on_children(self, widget, children):
+        if not self.valid:
+            return
+
+        # Moving volatile around doesn't change the other boxes
+        indexed = self._children.get(widget)
+        children = [child for child in children
+                    if child is not self.volatile]
+        if indexed is None or len(indexed) != len(children) or \
+                any(a is not b for a, b in zip(indexed, children)):
+            self.valid = False
+
+    def build(self, root, volatile=None):
+        '''To index root and its descendants, except the subtree of
+           volatile.
+        '''
+
+        # Widgets are unbound here, rather than when the index is
+        # invalidated, as it is invalidated while they dispatch
+        self._unbind_all()
+        self._cells = {}
+        self._children = {}
+        self._dirty = False
+        self.root = root
+        self.volatile = volatile
+        if root is None:
+            self.valid = True
+            return
+
+        cell_size = self.cell_size
+        cells = self._cells
+        stack = [root]
+        while stack:
+            widget = stack.pop()
+            box = get_window_box(widget)
+            entry = (widget, box)
+            for i in range(int(box[0] // cell_size),
+                           int(box[2] // cell_size) + 1):
+                for j in range(int(box[1] // cell_size),
+                               int(box[3] // cell_size) + 1):
+                    cells.setdefault((i, j), []).append(entry)
+
+            children = [child for child in widget.children
+                        if child is not volatile]
+            self._children[widget] = children
+            self._bind(widget, pos=self.invalidate, size=self.invalidate,
+                       children=self._on_children)
+            if isinstance(widget, Scatter):
+                self._bind(widget, transform=self.invalidate)
+
+            stack.extend(children)
+
+        parent = root.parent
+        while isinstance(parent, Widget):
+            self._bind(parent, pos=self.invalidate, size=self.invalidate)
+            if isinstance(parent, Scatter):
+                self._bind(parent, transform=self.invalidate)
+
+            parent = parent.parent
+
+        self.valid = True
+
+    def get_hit(self, x, y):
+        '''Returns the set of the widgets whose box contains x, y, in window
+           coordinates, and the set of these widgets and their parents.
+        '''
+
+        cell_size = self.cell_size
+        inside = set()
+        for widget, box in self._cells.get((int(x // cell_size),
+                                            int(y // cell_size)), ()):
+            if box[0] <= x <= box[2] and box[1] <= y <= box[3]:
+                inside.add(widget)
+
+        if self.volatile is not None:
+            stack = [self.volatile]
+            while stack:
+                widget = stack.pop()
+                box = get_window_box(widget)
+                if box[0] <= x <= box[2] and box[1] <= y <= box[3]:
+                    inside.add(widget)
+
+                stack.extend(widget.children)
+
+        hit = set(inside)
+        for widget in inside:
+            parent = widget.parent
+            while isinstance(parent, Widget) and parent not in hit:
+                hit.add(parent)
+                parent = parent.parent
+
+        return inside, hit
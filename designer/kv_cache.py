@@ -0,0 +1,103 @@
+'''This module contains KVCache, a cache of the information extracted from
+   the kv files of a project. Information is stored by the hash of the
+   content of the kv file, so that an unchanged file doesn't need to be
+   scanned again when project is reopened.
+'''
+
+import os
+import json
+import hashlib
+
+KV_CACHE_VERSION = 2
+'''Version of the cache format. Caches written with any other version are
+   discarded when loaded.
+'''
+
+
+def get_content_hash(content):
+    '''Returns the hash used to identify content.
+    '''
+
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+
+    return hashlib.md5(content).hexdigest()
+
+
+class KVCache(object):
+    '''KVCache stores for each kv file content its preprocessed string, its
+       class rules, its root rule and the line span of each of its rules.
+       It is saved in project's .designer directory.
+    '''
+
+    def __init__(self, path):
+        super(KVCache, self).__init__()
+        self.path = path
+        self._entries = {}
+        self._used = set()
+        self._modified = False
+
+    def load(self):
+        '''To load the cache from self.path. Cache is empty if the file
+           cannot be read or has been written by another version.
+        '''
+
+        self._entries = {}
+        self._used = set()
+        self._modified = False
+        try:
+            f = open(self.path, 'r')
+            data = json.load(f)
+            f.close()
+        except (IOError, ValueError):
+            return
+
+        if not isinstance(data, dict) or \
+                data.get('version') != KV_CACHE_VERSION:
+            return
+
+        self._entries = data.get('entries', {})
+
+    def get(self, content):
+        '''Returns the information stored for content, None if nothing has
+           been stored.
+        '''
+
+        content_hash = get_content_hash(content)
+        info = self._entries.get(content_hash)
+        if info is not None:
+            self._used.add(content_hash)
+
+        return info
+
+    def set(self, content, info):
+        '''To store info for content.
+        '''
+
+        content_hash = get_content_hash(content)
+        self._entries[content_hash] = info
+        self._used.add(content_hash)
+        self._modified = True
+
+    def save(self):
+        '''To save the cache to self.path. Entries which haven't been used
+           since the cache was loaded are removed.
+        '''
+
+        if not self._modified and len(self._used) == len(self._entries):
+            return
+
+        entries = dict((content_hash, info)
+                       for content_hash, info in self._entries.items()
+                       if content_hash in self._used)
+
+        _dir = os.path.dirname(self.path)
+        if not os.path.exists(_dir):
+            os.makedirs(_dir)
+
+        f = open(self.path, 'w')
+        json.dump({'version': KV_CACHE_VERSION, 'entries': entries}, f)
+        f.close()
+
+        self._entries = entries
+        self._modified = False
@@ -0,0 +1,241 @@
+'''This module contains a light weight parser for kv lang. It is used by
+   Kivy Designer to know which rules, widgets and properties are declared
+   in a kv text, and on which lines they are, without asking Builder to
+   parse the whole text again.
+'''
+
+import re
+
+from collections import OrderedDict
+
+from designer.helper_functions import get_indentation
+
+
+class KVProperty(object):
+    '''KVProperty represents a property or an event handler declared in
+       the rule of a widget.
+    '''
+
+    def __init__(self, name, value, lineno, indent):
+        super(KVProperty, self).__init__()
+        self.name = name
+        self.value = value
+        self.lineno = lineno
+        self.end_lineno = lineno
+        self.indent = indent
+
+
+class KVBlock(object):
+    '''KVBlock represents a block whose content is not parsed, like
+       canvas instructions.
+    '''
+
+    def __init__(self, name, lineno, indent):
+        super(KVBlock, self).__init__()
+        self.name = name
+        self.lineno = lineno
+        self.end_lineno = lineno
+        self.indent = indent
+
+
+class KVNode(object):
+    '''KVNode represents a rule or a widget declared inside a rule. Its
+       kind is 'class' for class rules, 'template' for templates, 'root'
+       for the root rule and 'widget' for children declared inside a rule.
+    '''
+
+    def __init__(self, name, header, lineno, indent, kind='widget',
+                 parent=None):
+        super(KVNode, self).__init__()
+        self.name = name
+        self.header = header
+        self.kind = kind
+        self.lineno = lineno
+        self.end_lineno = lineno
+        self.indent = indent
+        self.parent = parent
+        self.children = []
+        self.properties = OrderedDict()
+        self.own_lines = []
+
+    def get_path(self):
+        '''Returns the list of indexes of this node and its ancestors in
+           their parent's children, starting from the rule.
+        '''
+
+        path = []
+        node = self
+        while node.parent:
+            path.insert(0, node.parent.children.index(node))
+            node = node.parent
+
+        return path
+
+    def get_values(self):
+        '''Returns a dict of all the properties and event handlers declared
+           in this node with their values.
+        '''
+
+        return dict((name, prop.value)
+                    for name, prop in self.properties.items())
+
+    def get_signature(self):
+        '''Returns a value which changes whenever the header, properties,
+           canvas or list of children of this node change. Changes inside
+           children do not change it.
+        '''
+
+        return (self.header, tuple(self.own_lines),
+                tuple(child.name for child in self.children))
+
+    def iter_nodes(self):
+        '''Iterates over this node and all its descendants.
+        '''
+
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+
+def _get_rule_kind_and_name(header):
+    '''Returns the kind and the name of a rule from its header.
+    '''
+
+    if header[0] == '<':
+        name = header[1:header.find('>')]
+        kind = 'class'
+
+    elif header[0] == '[':
+        name = header[1:header.find(']')]
+        kind = 'template'
+
+    else:
+        name = header
+        kind = 'root'
+
+    name = name.split('@')[0].split(',')[0].strip()
+    return kind, name
+
+
+def parse_kv(text):
+    '''Parses text and returns the list of its rules as
+       :class:`~designer.kv_parser.KVNode`. Line numbers are zero based and
+       refer to the lines of text. Comments are removed in the same way
+       as it is done by :class:`~designer.uix.kv_lang_area.KVLangArea`.
+    '''
+
+    rules = []
+    stack = []
+    for lineno, line in enumerate(text.splitlines()):
+        line = re.sub(r'#.+', '', line)
+        content = line.strip()
+        if content == '' or content[0] == '#':
+            continue
+
+        indent = get_indentation(line)
+        while stack and stack[-1].indent >= indent:
+            stack.pop()
+
+        for item in stack:
+            item.end_lineno = lineno
+
+        if not stack:
+            if indent != 0 or content[-1] != ':':
+                continue
+
+            header = content[:-1].strip()
+            if not header:
+                continue
+
+            kind, name = _get_rule_kind_and_name(header)
+            node = KVNode(name, header, lineno, indent, kind=kind)
+            rules.append(node)
+            stack.append(node)
+            continue
+
+        owner = stack[-1]
+        if not isinstance(owner, KVNode):
+            # Continuation of a property value or of a canvas block,
+            # it belongs to the widget which declared them
+            for item in reversed(stack):
+                if isinstance(item, KVNode):
+                    owner = item
+                    break
+
+            owner.own_lines.append(line[owner.indent:].rstrip())
+            if isinstance(stack[-1], KVProperty):
+                prop = stack[-1]
+                prop.value = (prop.value + '\n' + content).strip()
+            continue
+
+        colon_pos = content.find(':')
+        if colon_pos == len(content) - 1 or colon_pos == -1:
+            name = content.rstrip(':').strip()
+            if name.startswith('canvas'):
+                block = KVBlock(name, lineno, indent)
+                owner.own_lines.append(line[owner.indent:].rstrip())
+                stack.append(block)
+
+            elif name and name[0].isupper():
+                node = KVNode(name, name, lineno, indent, parent=owner)
+                owner.children.append(node)
+                stack.append(node)
+
+            elif name:
+                # Property whose value is on the following lines
+                prop = KVProperty(name, '', lineno, indent)
+                owner.properties[name] = prop
+                owner.own_lines.append(line[owner.indent:].rstrip())
+                stack.append(prop)
+
+        else:
+            name = content[:colon_pos].strip()
+            prop = KVProperty(name, content[colon_pos + 1:].strip(),
+                              lineno, indent)
+            owner.properties[name] = prop
+            owner.own_lines.append(line[owner.indent:].rstrip())
+            stack.append(prop)
+
+    return rules
+
+
+def find_rule(rules, name):
+    '''Returns the first rule in rules with name, None if there is no
+       such rule.
+    '''
+
+    for rule in rules:
+        if rule.name == name:
+            return rule
+
+    return None
+
+
+def get_node_text(lines, node):
+    '''Returns the text of node and all its children from lines, dedented
+       so that node's header has no indentation.
+    '''
+
+    node_lines = []
+    for line in lines[node.lineno:node.end_lineno + 1]:
+        node_lines.append(line[node.indent:] if line.strip() else '')
+
+    return '\n'.join(node_lines)
+
+
+def get_changed_nodes(old_node, new_node):
+    '''Compares two parsed versions of the same node and returns the list
+       of topmost nodes of new_node's tree which differ from old_node's.
+       Unchanged subtrees are not visited further.
+    '''
+
+    if old_node.get_signature() != new_node.get_signature():
+        return [new_node]
+
+    changed = []
+    for old_child, new_child in zip(old_node.children, new_node.children):
+        changed.extend(get_changed_nodes(old_child, new_child))
+
+    return changed
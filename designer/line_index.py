@@ -0,0 +1,261 @@
+'''This module contains LineIndex, the index of the lines of a text used by
+   :class:`~designer.uix.kv_lang_area.KVLangArea`. It keeps the offset at
+   which each line starts and each line with its comments removed, so that
+   a line is converted to an offset, and back, with a binary search instead
+   of splitting the whole text again. When the text changes, only the lines
+   around the changed part are split again.
+
+   Lines can be marked, e.g. with the widget declared on them. Marks follow
+   their line when lines are inserted or removed before it and are removed
+   when their line is changed.
+'''
+
+import re
+
+from bisect import bisect_right
+from weakref import WeakKeyDictionary
+
+from designer.helper_functions import get_indentation
+
+COMMENT_RE = re.compile(r'#.+')
+'''Regular expression matching the comment of a line.
+'''
+
+
+def _get_common_prefix_len(a, b):
+    '''Returns the length of the longest common prefix of a and b. Slices
+       are compared, instead of characters, so that it is done in C.
+    '''
+
+    low = 0
+    high = min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[low:mid] == b[low:mid]:
+            low = mid
+        else:
+            high = mid - 1
+
+    return low
+
+
+def _get_common_suffix_len(a, b, limit):
+    '''Returns the length, at most limit, of the longest common suffix of
+       a and b.
+    '''
+
+    len_a = len(a)
+    len_b = len(b)
+    low = 0
+    high = limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len_a - mid:len_a - low] == b[len_b - mid:len_b - low]:
+            low = mid
+        else:
+            high = mid - 1
+
+    return low
+
+
+class LineIndex(object):
+    '''LineIndex is the index of the lines of text. Lines are separated by
+       '\\n' and are numbered from 0.
+    '''
+
+    def __init__(self, text=''):
+        super(LineIndex, self).__init__()
+        self.version = 0
+        self.marks = WeakKeyDictionary()
+        self.set_text(text)
+
+    def set_text(self, text):
+        '''To index text from scratch.
+        '''
+
+        self.text = text
+        self.starts = [0] + [match.end() for match in
+                             re.finditer('\n', text)]
+        self.lines = COMMENT_RE.sub('', text).split('\n')
+        self.version += 1
+        self.marks.clear()
+        self._root_lineno = None
+
+    def update(self, text):
+        '''To update the index for text, the new text of the indexed one.
+           Only the part which differs from the indexed text is indexed
+           again.
+        '''
+
+        old_text = self.text
+        if text == old_text:
+            self.text = text
+            return
+
+        prefix = _get_common_prefix_len(old_text, text)
+        suffix = _get_common_suffix_len(
+            old_text, text, min(len(old_text), len(text)) - prefix)
+        self.splice(prefix, len(old_text) - suffix,
+                    text[prefix:len(text) - suffix])
+
+    def splice(self, start, end, s):
+        '''To replace the text between offsets start and end with s and
+           update the index of the lines it touches. Offsets of the lines
+           after them are shifted. Offsets are interpreted as slice indices
+           of the text.
+        '''
+
+        old_text = self.text
+        start, end, _ = slice(start, end).indices(len(old_text))
+        end = max(start, end)
+        first = bisect_right(self.starts, start) - 1
+        last = bisect_right(self.starts, end) - 1
+        region_start = self.starts[first]
+        region_end = self.get_line_end_offset(last)
+        # A mark on the first line is kept if the change is after its
+        # content
+        first_line_end = region_start + \
+            len(old_text[region_start:self.get_line_end_offset(first)]
+                .rstrip())
+
+        new_lines = (old_text[region_start:start] + s +
+                     old_text[end:region_end]).split('\n')
+        starts = [region_start]
+        for line in new_lines[:-1]:
+            starts.append(starts[-1] + len(line) + 1)
+
+        delta = len(s) - (end - start)
+        self.starts[first:] = starts + [pos + delta for pos in
+                                        self.starts[last + 1:]]
+        self.lines[first:last + 1] = [COMMENT_RE.sub('', line)
+                                      for line in new_lines]
+        self.text = old_text[:start] + s + old_text[end:]
+        self.version += 1
+
+        line_delta = len(new_lines) - (last - first + 1)
+        for key, mark in list(self.marks.items()):
+            if mark[0] > last:
+                mark[0] += line_delta
+            elif mark[0] > first or \
+                    (mark[0] == first and start < first_line_end):
+                del self.marks[key]
+
+        # A line before the root's one cannot have become the root's line
+        if self._root_lineno is not None and \
+                (self._root_lineno[1] is None or
+                 self._root_lineno[1] >= first):
+            self._root_lineno = None
+
+    def set_mark(self, key, lineno, data=None):
+        '''To mark line lineno with key. data is stored along with the
+           mark.
+        '''
+
+        self.marks[key] = [lineno, data]
+
+    def get_mark(self, key):
+        '''Returns the line marked with key and the data stored with the
+           mark as a tuple, None if there is no such mark.
+        '''
+
+        mark = self.marks.get(key)
+        if mark is None:
+            return None
+
+        return tuple(mark)
+
+    def get_marks_at(self, lineno):
+        '''Returns the keys of the marks of line lineno.
+        '''
+
+        return [key for key, mark in self.marks.items() if mark[0] == lineno]
+
+    def get_lines(self, rstrip=False):
+        '''Returns the lines of the text with their comments removed, as
+           re.sub(r'#.+', '', text).splitlines() would. If rstrip is True
+           then the trailing whitespaces of text are ignored, as if it was
+           text.rstrip(). The returned list can be modified.
+        '''
+
+        total_lines = len(self.lines)
+        if not rstrip:
+            if self.lines[-1] == '':
+                return self.lines[:-1]
+            return self.lines[:]
+
+        while total_lines > 0 and not self.get_line(total_lines - 1).strip():
+            total_lines -= 1
+
+        if total_lines == 0:
+            return []
+
+        lines = self.lines[:total_lines]
+        last_line = self.get_line(total_lines - 1).rstrip()
+        lines[-1] = COMMENT_RE.sub('', last_line)
+        if lines[-1] == '':
+            lines.pop()
+        return lines
+
+    def get_line(self, lineno):
+        '''Returns the text of line lineno, with its comments.
+        '''
+
+        return self.text[self.get_line_offset(lineno):
+                         self.get_line_end_offset(lineno)]
+
+    def get_line_offset(self, lineno):
+        '''Returns the offset at which line lineno starts.
+        '''
+
+        return self.starts[lineno]
+
+    def get_line_end_offset(self, lineno):
+        '''Returns the offset at which line lineno ends, the offset of its
+           '\\n' or the length of the text for the last line.
+        '''
+
+        if lineno + 1 < len(self.starts):
+            return self.starts[lineno + 1] - 1
+
+        return len(self.text)
+
+    def get_offset_line(self, offset):
+        '''Returns the number of the line containing offset.
+        '''
+
+        return bisect_right(self.starts, offset) - 1
+
+    def get_line_start_pos(self, lineno):
+        '''Same as :func:`~designer.helper_functions.get_line_start_pos`
+           for the indexed text.
+        '''
+
+        return self.get_line_end_pos(max(lineno - 1, 0))
+
+    def get_line_end_pos(self, lineno):
+        '''Same as :func:`~designer.helper_functions.get_line_end_pos` for
+           the indexed text.
+        '''
+
+        if lineno + 1 < len(self.starts):
+            return self.starts[lineno + 1] - 1
+
+        return -1
+
+    def get_root_lineno(self, root_name):
+        '''Returns the number of the first not indented line containing
+           root_name, 0 if there is none. It is searched again only when
+           the text up to that line changes.
+        '''
+
+        if self._root_lineno is None or self._root_lineno[0] != root_name:
+            root_lineno = None
+            for lineno, line in enumerate(self.lines):
+                if line.find(root_name) != -1 and \
+                        get_indentation(line) == 0:
+                    root_lineno = lineno
+                    break
+
+            self._root_lineno = (root_name, root_lineno)
+
+        return self._root_lineno[1] or 0
@@ -5,8 +5,6 @@ from kivy.app import App
 from kivy.clock import Clock
 from kivy.uix.tabbedpanel import TabbedPanel
 
-from designer.common import widgets
-
 
 class WidgetTreeElement(TreeViewLabel):
     '''WidgetTreeElement represents each node in WidgetsTree
@@ -47,7 +45,21 @@ class WidgetsTree(ScrollView):
     def __init__(self, **kwargs):
         super(WidgetsTree, self).__init__(**kwargs)
         self.refresh = Clock.create_trigger(self._refresh)
+        self._update_trigger = Clock.create_trigger(self._update)
         self._widget_cache = {}
+        self._changed_widgets = []
+        self._selected = None
+
+    def _shows_children(self, node):
+        '''Returns True if the children of node are shown in the tree.
+           Children of custom and complex widgets are not shown, except for
+           the root widget.
+        '''
+
+        if self.project_loader.root_rule.widget == node:
+            return True
+
+        return not self.project_loader.widget_classifier.hides_children(node)
 
     def recursive_insert(self, node, treenode):
         '''This function will add a node to TreeView, by recursively travelling
@@ -59,23 +71,8 @@ class WidgetsTree(ScrollView):
 
         b = self._get_widget(node)
         self.tree.add_node(b, treenode)
-        class_rules = self.project_loader.class_rules
-        root_widget = self.project_loader.root_rule.widget
-
-        is_child_custom = False
-        for rule in class_rules:
-            if rule.name == type(node).__name__:
-                is_child_custom = True
-                break
-
-        is_child_complex = False
-        for widget in widgets:
-            if widget[0] == type(node).__name__ and widget[1] == 'complex':
-                is_child_complex = True
-                break
-
-        if root_widget == node or (not is_child_custom and
-                                   not is_child_complex):
+
+        if self._shows_children(node):
             if isinstance(node, TabbedPanel):
                 self.insert_for_tabbed_panel(node, b)
             else:
@@ -112,9 +109,124 @@ class WidgetsTree(ScrollView):
         '''This function will refresh the tree. It will first remove all nodes
            and then insert them using recursive_insert
         '''
+        self._changed_widgets = []
         self._clear_tree(self.tree, self.tree.root)
         self.recursive_insert(self.playground.root, self.tree.root)
         self._clean_cache()
+        self.select_widget(self._selected)
+
+    def update_widget(self, widget):
+        '''To update, in the next frame, the nodes of the children of
+           widget, after children have been added to or removed from it.
+           Only the subtree of widget is changed. If widget is None, i.e.
+           the root widget has changed, then the whole tree is refreshed.
+        '''
+
+        if widget is None:
+            self.refresh()
+            return
+
+        self._changed_widgets.append(widget)
+        self._update_trigger()
+
+    def _get_node(self, widget):
+        '''Returns the node of widget if it is in the tree, None otherwise.
+        '''
+
+        try:
+            node = self._widget_cache[widget]
+            # Node may belong to the subtree of a removed node
+            parent = node.parent_node
+            while parent is not None and parent is not self.tree.root:
+                parent = parent.parent_node
+        except (KeyError, ReferenceError):
+            return None
+
+        if parent is None:
+            return None
+
+        return node
+
+    def _update(self, *args):
+        '''To update the subtrees of the widgets passed to
+           :meth:`update_widget`.
+        '''
+
+        changed = self._changed_widgets
+        self._changed_widgets = []
+        updated = []
+        for widget in changed:
+            # Widget may be an inner widget of its kv parent, e.g. of a
+            # Carousel, so update the nearest widget which is in the tree
+            node = None
+            while widget is not None:
+                node = self._get_node(widget)
+                if node is not None:
+                    break
+                widget = widget.parent
+
+            if node is None:
+                self.refresh()
+                return
+
+            if widget not in updated:
+                updated.append(widget)
+                self._update_subtree(widget, node)
+
+        self._clean_cache()
+        self.select_widget(self._selected)
+
+    def _update_subtree(self, widget, treenode):
+        '''To make the nodes of treenode, the node of widget, match the
+           current children of widget. Nodes of children which were
+           already in the tree are kept with their own subtree.
+        '''
+
+        if not self._shows_children(widget):
+            children = []
+        elif isinstance(widget, TabbedPanel):
+            children = widget.tab_list
+        else:
+            children = widget.children
+
+        old_nodes = dict((id(n.node), n) for n in treenode.nodes)
+        for n in treenode.nodes[:]:
+            self.tree.remove_node(n)
+
+        for child in children:
+            node = old_nodes.get(id(child))
+            if node is not None and node.node is child:
+                self.tree.add_node(node, treenode)
+                continue
+
+            # Nodes of a widget which is added back may still have the
+            # nodes of its former children
+            try:
+                node = self._widget_cache.get(child)
+                if node:
+                    self._clear_tree(self.tree, node)
+            except ReferenceError:
+                pass
+
+            if isinstance(widget, TabbedPanel):
+                b = self._get_widget(child)
+                self.tree.add_node(b, treenode)
+                self.recursive_insert(child.content, b)
+            else:
+                self.recursive_insert(child, treenode)
+
+    def select_widget(self, widget):
+        '''To highlight the node of widget, which is the selected widget.
+           The tree itself is not changed.
+        '''
+
+        self._selected = widget
+        node = self._get_node(widget) if widget is not None else None
+        if node is not None:
+            self.tree.select_node(node)
+
+        elif self.tree.selected_node:
+            self.tree.selected_node.is_selected = False
 
     def _clean_cache(self):
         for node, wid in self._widget_cache.items():
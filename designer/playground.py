@@ -24,20 +24,22 @@ from kivy.uix.actionbar import ActionBar
 from kivy.graphics import Color, Line
 from kivy.uix.tabbedpanel import TabbedPanel
 
-from designer.common import widgets
 from designer.tree import Tree
+from designer.hit_index import HitIndex
 from designer.undo_manager import WidgetOperation, WidgetDragOperation
 from designer.uix.designer_sandbox import DesignerSandbox
 
 
 def widget_contains(container, child):
-    '''Search recursively for child in container
+    '''Returns True if child is container or one of its descendants, by
+       going up the parents of child.
     '''
-    if container == child:
-        return True
-    for w in container.children:
-        if widget_contains(w, child):
+    while child is not None:
+        if child is container:
             return True
+
+        child = child.parent
+
     return False
 
 
@@ -388,6 +390,8 @@ class PlaygroundDragElement(BoxLayout):
                 self.remove_lines_on_child()
                 self.target = None
 
+            self.playground.drag_ended()
+
         if self.parent:
             self.parent.remove_widget(self)
 
@@ -467,9 +471,8 @@ class Playground(ScatterPlane):
         self.keyboard = None
         self.selected_widget = None
         self.undo_manager = None
-        self._widget_x = -1
-        self._widget_y = -1
         self.widget_to_paste = None
+        self._hit_index = HitIndex()
 
     def on_pos(self, *args):
         '''Default handler for 'on_pos'
@@ -518,8 +521,8 @@ class Playground(ScatterPlane):
         '''This function will drag widget from one place to another inside
            target
         '''
-        extra_args['prev_x'], extra_args['prev_y'] = \
-            self.to_parent(self._widget_x, self._widget_y)
+        self.widgettree.update_widget(target)
+        transaction = self.kv_code_input.transaction()
 
         if isinstance(target, FloatLayout) or \
                 isinstance(target, ScatterLayout) or \
@@ -531,17 +534,11 @@ class Playground(ScatterPlane):
             self.from_drag = False
             added = True
             local_x, local_y = widget.x - target.x, widget.y - target.y
-            self.kv_code_input.set_property_value(
-                widget, 'pos_hint', "{'x': %f, 'y': %f}" % (
-                    local_x / target.width, local_y / target.height),
-                'ListPropery')
-
-            if not from_undo:
-                self.undo_manager.push_operation(
-                    WidgetDragOperation(widget, target,
-                                        self.drag_operation[1],
-                                        self.drag_operation[2],
-                                        self, extra_args=extra_args))
+            with transaction:
+                self.kv_code_input.set_property_value(
+                    widget, 'pos_hint', "{'x': %f, 'y': %f}" % (
+                        local_x / target.width, local_y / target.height),
+                    'ListPropery')
 
         elif isinstance(target, BoxLayout) or \
                 isinstance(target, AnchorLayout) or \
@@ -549,19 +546,18 @@ class Playground(ScatterPlane):
             target.add_widget(widget, extra_args['index'])
             self.from_drag = False
             added = True
-            if 'prev_index' in extra_args:
-                self.kv_code_input.shift_widget(widget,
-                                                extra_args['prev_index'])
+            with transaction:
+                if 'prev_index' in extra_args:
+                    self.kv_code_input.shift_widget(widget,
+                                                    extra_args['prev_index'])
 
-            else:
-                self.kv_code_input.shift_widget(widget, self.drag_operation[2])
+                else:
+                    self.kv_code_input.shift_widget(widget,
+                                                    self.drag_operation[2])
 
-            if not from_undo:
-                self.undo_manager.push_operation(
-                    WidgetDragOperation(widget, target,
-                                        self.drag_operation[1],
-                                        self.drag_operation[2],
-                                        self, extra_args=extra_args))
+        if not from_undo and transaction.delta:
+            self.undo_manager.push_operation(
+                WidgetDragOperation(self.kv_code_input, transaction.delta))
 
     def add_widget_to_parent(self, widget, target, from_undo=False,
                              from_kv=False, kv_str='', extra_args={}):
@@ -587,16 +583,37 @@ class Playground(ScatterPlane):
         if not added:
             return False
 
-        self.widgettree.refresh()
+        self.widgettree.update_widget(target)
 
+        transaction = self.kv_code_input.transaction()
         if not from_kv:
-            self.kv_code_input.add_widget_to_parent(widget, target,
-                                                    kv_str=kv_str)
-        if not from_undo:
+            with transaction:
+                self.kv_code_input.add_widget_to_parent(widget, target,
+                                                        kv_str=kv_str)
+        if not from_undo and transaction.delta:
             root = App.get_running_app().root
-            root.undo_manager.push_operation(WidgetOperation('add',
-                                                             widget, target,
-                                                             self, ''))
+            root.undo_manager.push_operation(
+                WidgetOperation('add', self.kv_code_input, transaction.delta))
+
+    def replace_widget(self, widget, new_widget):
+        '''This function is used to replace widget by new_widget at the same
+           place in widget's parent. It is used by KVLangArea to apply a
+           changed rule without rebuilding the whole root widget.
+        '''
+        parent = widget.parent
+        index = parent.children.index(widget)
+        with self.sandbox:
+            parent.remove_widget(widget)
+            parent.add_widget(new_widget, index)
+
+        if self.selected_widget == widget:
+            self.selected_widget = new_widget
+
+        app = App.get_running_app()
+        if app.widget_focused == widget:
+            app.focus_widget(new_widget)
+
+        self.widgettree.update_widget(parent)
 
     def get_widget(self, widgetname, **default_args):
         '''This function is used to get the instance of class of name,
@@ -605,13 +622,10 @@ class Playground(ScatterPlane):
 
         widget = None
         with self.sandbox:
-            custom = False
-            for _widget in widgets:
-                if _widget[0] == widgetname and _widget[1] == 'custom':
-                    widget = App.get_running_app().root\
-                        .project_loader.get_widget_of_class(widgetname)
-                    custom = True
-            if not custom:
+            project_loader = App.get_running_app().root.project_loader
+            if project_loader.widget_classifier.is_custom(widgetname):
+                widget = project_loader.get_widget_of_class(widgetname)
+            else:
                 try:
                     widget = getattr(Factory, widgetname)(**default_args)
                 except:
@@ -643,6 +657,8 @@ class Playground(ScatterPlane):
                                            from_kv=True)
 
         self.tree = Tree()
+        self._hit_index.thaw()
+        self._hit_index.build(None)
 
     def remove_widget_from_parent(self, widget, from_undo=False,
                                   from_kv=False):
@@ -654,10 +670,10 @@ class Playground(ScatterPlane):
         if not widget:
             return
 
-        removed_str = ''
+        transaction = self.kv_code_input.transaction()
         if not from_kv:
-            removed_str = self.kv_code_input.remove_widget_from_parent(widget,
-                                                                       parent)
+            with transaction:
+                self.kv_code_input.remove_widget_from_parent(widget, parent)
         if widget != self.root:
             parent = widget.parent
             if isinstance(parent.parent, Carousel):
@@ -676,81 +692,86 @@ class Playground(ScatterPlane):
             self.root = None
 
         # self.tree.delete(widget)
-        root.ui_creator.widgettree.refresh()
-        if not from_undo:
+        root.ui_creator.widgettree.update_widget(parent)
+        if not from_undo and transaction.delta:
             root.undo_manager.push_operation(
-                WidgetOperation('remove', widget, parent, self, removed_str))
+                WidgetOperation('remove', self.kv_code_input,
+                                transaction.delta))
 
     def find_target(self, x, y, target, widget=None):
         '''This widget is used to find the widget which collides with x,y
+           in the coordinates of the playground. Widgets colliding with x,y
+           are looked up in self._hit_index.
         '''
-        if target is None or not target.collide_point(x, y):
+        if target is None:
             return None
 
-        x, y = target.to_local(x, y)
-        class_rules = App.get_running_app().root.project_loader.class_rules
+        inside, hit = self._get_hit(x, y, widget)
+        return self._find_target(target, widget, inside, hit)
 
-        for child in target.children:
-            is_child_custom = False
-            for rule in class_rules:
-                if rule.name == type(child).__name__:
-                    is_child_custom = True
-                    break
+    def _get_hit(self, x, y, widget=None):
+        '''Returns the widgets colliding with x,y and the widgets having a
+           descendant colliding with it, see
+           :meth:`~designer.hit_index.HitIndex.get_hit`. widget is the
+           widget being dragged, if any, the index is then frozen until
+           :meth:`drag_ended` is called.
+        '''
+        index = self._hit_index
+        if not index.valid or index.root is not self.root or \
+                (widget is not None and index.volatile is not widget):
+            index.build(self.root,
+                        widget if widget is not None else index.volatile)
 
-            is_child_complex = False
-            for _widget in widgets:
-                if _widget[0] == type(child).__name__ and\
-                        _widget[1] == 'complex':
-                    is_child_complex = True
-                    break
+        if widget is not None:
+            index.freeze()
 
+        return index.get_hit(*self.to_window(*self.to_parent(x, y)))
+
+    def drag_ended(self):
+        '''To be called once the dragged widget has been dropped, so that
+           widgets are looked up in their new places.
+        '''
+        self._hit_index.thaw()
+
+    def _find_target(self, target, widget, inside, hit):
+        if target is None or target not in inside:
+            return None
+
+        classifier = App.get_running_app().root.\
+            project_loader.widget_classifier
+
+        for child in target.children:
             # if point lies in custom wigdet's child then return custom widget
-            if is_child_custom or is_child_complex:
-                if not widget and self._custom_widget_collides(child, x, y):
+            if classifier.hides_children(child):
+                if not widget and child in hit:
                     return child
 
                 elif widget:
                     if isinstance(child, TabbedPanel):
                         if child.current_tab:
-                            _item = self.find_target(
-                                x, y, child.current_tab.content)
+                            _item = self._find_target(
+                                child.current_tab.content, None, inside, hit)
                             return _item
 
                     else:
                         return target
 
             elif isinstance(child.parent, Carousel):
-                t = self.find_target(x, y, child, widget)
+                t = self._find_target(child, widget, inside, hit)
                 return t
 
             else:
-                if not child.collide_point(x, y):
+                if child not in inside:
                     continue
 
                 if not self.allowed_target_for(child, widget) and not\
                         child.children:
                     continue
 
-                return self.find_target(x, y, child, widget)
+                return self._find_target(child, widget, inside, hit)
 
         return target
 
-    def _custom_widget_collides(self, widget, x, y):
-        '''This widget is used to find which custom widget collides with x,y
-        '''
-        if not widget:
-            return False
-
-        if widget.collide_point(x, y):
-            return True
-
-        x, y = widget.to_local(x, y)
-        for child in widget.children:
-            if self._custom_widget_collides(child, x, y):
-                return True
-
-        return False
-
     def allowed_target_for(self, target, widget):
         '''This function is used to determine if widget could be added to
            target.
@@ -850,28 +871,19 @@ class Playground(ScatterPlane):
         '''
         parent = self.selected_widget
         if parent and self.widget_to_paste:
-            class_rules = App.get_running_app().root.\
-                project_loader.class_rules
+            classifier = App.get_running_app().root.\
+                project_loader.widget_classifier
             root_widget = App.get_running_app().root.\
                 project_loader.root_rule.widget
-            is_child_custom = False
-            for rule in class_rules:
-                if rule.name == type(parent).__name__:
-                    is_child_custom = True
-                    break
 
             # find appropriate parent to add widget_to_paste
             while parent:
+                is_child_custom = classifier.has_rule(type(parent).__name__)
                 if isinstance(parent, Layout) and (not is_child_custom
                                                    or root_widget == parent):
                     break
 
                 parent = parent.parent
-                is_child_custom = False
-                for rule in class_rules:
-                    if rule.name == type(parent).__name__:
-                        is_child_custom = True
-                        break
 
             if parent is not None:
                 self.add_widget_to_parent(self.widget_to_paste,
@@ -933,6 +945,7 @@ class Playground(ScatterPlane):
 
         self.drag_operation[1].add_widget(self.drag_operation[0],
                                           self.drag_operation[2])
+        self.widgettree.update_widget(self.drag_operation[1])
         Clock.schedule_once(functools.partial(
                             App.get_running_app().focus_widget,
                             self.drag_operation[0]), 0.01)
@@ -947,11 +960,11 @@ class Playground(ScatterPlane):
             # x, y = self.to_local(*touch.pos)
             # target = self.find_target(x, y, self.root)
             drag_widget = self.selected_widget
-            self._widget_x, self._widget_y = drag_widget.x, drag_widget.y
             index = self.selected_widget.parent.children.index(drag_widget)
             self.drag_operation = (drag_widget, drag_widget.parent, index)
 
             self.selected_widget.parent.remove_widget(self.selected_widget)
+            self.widgettree.update_widget(self.drag_operation[1])
             drag_elem = App.get_running_app().create_draggable_element(
                 '', self.touch, self.selected_widget)
 
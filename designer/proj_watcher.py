@@ -1,11 +1,112 @@
 import sys
 import os
 import time
+import threading
 
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
+from kivy.clock import Clock
 import traceback
 
+from designer.project_walker import IgnoreRules, DEFAULT_EXCLUDES
+from designer.helper_functions import ATOMIC_TEMP_SUFFIX
+from designer.kv_cache import get_content_hash
+
+IGNORED_EXTENSIONS = ['.pyc', '.pyo', '.swp', '.swx', '.tmp',
+                      ATOMIC_TEMP_SUFFIX]
+'''Extensions of the files whose changes are ignored.
+'''
+
+
+def get_path_kind(path):
+    '''Returns the kind of the file at path, 'py', 'kv' or 'asset', from
+       its extension. 'ignored' is returned for temporary and compiled
+       files.
+    '''
+
+    name = os.path.basename(path)
+    ext = os.path.splitext(name)[1]
+    if ext == '.py':
+        return 'py'
+
+    if ext == '.kv':
+        return 'kv'
+
+    if ext in IGNORED_EXTENSIONS or name.endswith('~') or \
+            name.startswith('.#'):
+        return 'ignored'
+
+    return 'asset'
+
+
+def merge_event(prev_type, event_type):
+    '''Returns the event of a path whose event prev_type is followed by
+       event_type, None if the path is left unchanged.
+    '''
+
+    if prev_type == 'created' and event_type == 'deleted':
+        # A temporary file
+        return None
+
+    if prev_type == 'created':
+        return 'created'
+
+    if prev_type == 'deleted' and event_type == 'created':
+        return 'modified'
+
+    return event_type
+
+
+class ProjectChanges(object):
+    '''ProjectChanges is the set of changes made to the files of a project,
+       as passed to the callback of
+       :class:`~designer.proj_watcher.ProjectWatcher`. events maps the
+       path of each changed file to its last event type, 'created',
+       'modified' or 'deleted', and the paths are classified, by
+       :func:`get_path_kind`, in the py, kv, asset and ignored sets.
+    '''
+
+    def __init__(self, events):
+        super(ProjectChanges, self).__init__()
+        self.events = events
+        self._classify()
+
+    def _classify(self):
+        self.py = set()
+        self.kv = set()
+        self.asset = set()
+        self.ignored = set()
+        for path, (event_type, kind) in self.events.items():
+            getattr(self, kind).add(path)
+
+    def update(self, changes):
+        '''To add changes, made after these changes, to them.
+        '''
+
+        for path, (event_type, kind) in changes.events.items():
+            prev = self.events.get(path)
+            if prev is not None:
+                event_type = merge_event(prev[0], event_type)
+
+            if event_type is None:
+                del self.events[path]
+            else:
+                self.events[path] = (event_type, kind)
+
+        self._classify()
+
+    def get_paths(self, event_type=None):
+        '''Returns the set of the paths which haven't been ignored, only of
+           those whose event is event_type if it isn't None.
+        '''
+
+        return set(path for path, (_type, kind) in self.events.items()
+                   if kind != 'ignored' and
+                   (event_type is None or _type == event_type))
+
+    def __len__(self):
+        return len(self.events) - len(self.ignored)
+
 
 class ProjectEventHandler(FileSystemEventHandler):
     '''ProjectEventHandler is the event handler for any event occurring on
@@ -28,6 +129,15 @@ class ProjectWatcher(object):
        project directory. It will call self._callback whenever there
        are any changes. It can currently handle only one directory at
        a time.
+
+       Events are received on the thread of the observer, they are queued
+       and passed to self._callback on the main thread, as a single
+       :class:`ProjectChanges`, once no event has been received for
+       delay seconds.
+
+       Files written by Designer itself are recorded by
+       :meth:`record_write`, their events are dropped as long as their
+       content and their mtime are the ones written.
     '''
     def __init__(self, callback):
         super(ProjectWatcher, self).__init__()
@@ -35,41 +145,191 @@ class ProjectWatcher(object):
         self._observer = None
         self._event_handler = None
         self._callback = callback
-        self.allow_event_dispatch = True
+        self._delay = 0.5
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._writes = {}
+        self._last_event_time = 0
+        self._ignore_rules = None
+        self._project_dir = None
 
-    def start_watching(self, project_dir):
-        '''To start watching project_dir.
+    def start_watching(self, project_dir, excludes=[]):
+        '''To start watching project_dir. Changes of the paths matching
+           excludes, the patterns excluded by the project's settings, are
+           ignored as they are by
+           :func:`~designer.project_walker.walk_project`.
         '''
         self._project_dir = project_dir
+        self.set_excludes(excludes)
+        with self._lock:
+            self._pending = {}
+            self._writes = {}
+
         self._observer = Observer()
         self._event_handler = ProjectEventHandler(self._observer, self)
         self._watch = self._observer.schedule(self._event_handler,
                                               self._project_dir,
                                               recursive=True)
         self._observer.start()
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        Clock.unschedule(self._flush)
+        Clock.schedule_interval(self._flush, self._delay)
+
+    def _get_delay(self):
+        return self._delay
+
+    def _set_delay(self, delay):
+        self._delay = delay
+        # Queue is checked as often as it is expected to be quiet
+        if self._observer:
+            self._schedule_flush()
+
+    delay = property(_get_delay, _set_delay)
+
+    def set_excludes(self, excludes):
+        '''To set the patterns of the paths excluded by the project's
+           settings, whose changes are ignored.
+        '''
+        if self._project_dir is None:
+            return
+
+        rules = IgnoreRules(self._project_dir,
+                            DEFAULT_EXCLUDES + list(excludes))
+        rules.add_file(os.path.join(self._project_dir, '.gitignore'))
+        self._ignore_rules = rules
 
     def on_project_modified(self, *args):
         pass
 
+    def _is_ignored(self, path):
+        '''Returns True if path, or one of its directories, is ignored by
+           the project.
+        '''
+        rules = self._ignore_rules
+        rel_path = os.path.relpath(path, self._project_dir)
+        if rel_path.startswith(os.pardir):
+            return True
+
+        parts = rel_path.split(os.sep)
+        _path = self._project_dir
+        for i, part in enumerate(parts):
+            _path = os.path.join(_path, part)
+            if rules.match(_path, i < len(parts) - 1):
+                return True
+
+        return False
+
+    def _classify(self, path):
+        if self._is_ignored(path):
+            return 'ignored'
+
+        return get_path_kind(path)
+
+    def _add_event(self, path, event_type):
+        '''To queue event_type of path, merging it with the event already
+           queued for path. Called with self._lock held.
+        '''
+        prev = self._pending.get(path)
+        if prev is not None:
+            event_type = merge_event(prev[0], event_type)
+            if event_type is None:
+                del self._pending[path]
+                return
+
+        self._pending[path] = (event_type, self._classify(path))
+
+    def record_write(self, path, content):
+        '''To record that Designer is about to write content to the file at
+           path, so that the events of this write are dropped. It can be
+           called from any thread.
+        '''
+        with self._lock:
+            self._writes[os.path.normpath(path)] = \
+                [get_content_hash(content), None]
+
+    def _is_own_write(self, path):
+        '''Returns True if the file at path is the one last written by
+           Designer, i.e. it has its content and the mtime it was given by
+           this write. The mtime is recorded by the first check after the
+           write.
+        '''
+        record = self._writes.get(os.path.normpath(path))
+        if record is None:
+            return False
+
+        try:
+            mtime = os.stat(path).st_mtime
+            if record[1] is not None and record[1] != mtime:
+                return False
+
+            f = open(path, 'rb')
+            content = f.read()
+            f.close()
+
+        except (IOError, OSError):
+            return False
+
+        if get_content_hash(content) != record[0]:
+            return False
+
+        record[1] = mtime
+        return True
+
     def dispatch_proj_event(self, event):
-        '''To dispatch event to self._callback.
+        '''To queue event, it is called on the thread of the observer.
         '''
-        self.proj_event = event
-        # Do not dispatch event if '.designer' is modified
-        if '.designer' not in event.src_path and self.allow_event_dispatch:
-            self._callback(event)
+        if event.is_directory and event.event_type == 'modified':
+            return
+
+        with self._lock:
+            if event.event_type == 'moved':
+                self._add_event(event.src_path, 'deleted')
+                self._add_event(event.dest_path, 'created')
+
+            else:
+                self._add_event(event.src_path, event.event_type)
+
+            self._last_event_time = time.time()
+
+    def _flush(self, *args):
+        '''To pass the queued events to self._callback if no event has been
+           received for self.delay seconds.
+        '''
+        with self._lock:
+            if not self._pending or \
+                    time.time() - self._last_event_time < self.delay:
+                return
+
+            pending = self._pending
+            self._pending = {}
+
+        events = {}
+        for path, event in pending.items():
+            if event[0] == 'deleted' or not self._is_own_write(path):
+                events[path] = event
+
+        changes = ProjectChanges(events)
+        if len(changes):
+            self.proj_event = changes
+            self._callback(changes)
 
     def stop(self):
         '''To stop watching currently watched directory. This will also call
            join() on the thread created by Observer.
         '''
 
+        Clock.unschedule(self._flush)
         if self._observer:
             self._observer.unschedule_all()
             self._observer.stop()
             self.join()
 
         self._observer = None
+        with self._lock:
+            self._pending = {}
+            self._writes = {}
 
     def join(self):
         '''join observer after unschedulling it
@@ -0,0 +1,184 @@
+'''This module contains ProjectIndex, the structured record of a project
+   written by :meth:`~designer.project_loader.ProjectLoader.record` in
+   project's .designer directory. It is loaded back with a single parse
+   when the project is opened again.
+'''
+
+import os
+import json
+import time
+
+from collections import OrderedDict
+
+from designer.kv_cache import get_content_hash
+
+PROJECT_INDEX_VERSION = 4
+'''Version of the index format. Indexes written with any other version are
+   considered invalid.
+'''
+
+
+def get_file_stat(path):
+    '''Returns the path, mtime, size and content hash of the file at path
+       as a dict, None if it cannot be read.
+    '''
+
+    try:
+        stat = os.stat(path)
+        f = open(path, 'rb')
+        content = f.read()
+        f.close()
+    except (IOError, OSError):
+        return None
+
+    return {'path': path, 'mtime': stat.st_mtime, 'size': stat.st_size,
+            'hash': get_content_hash(content)}
+
+
+class ProjectIndex(object):
+    '''ProjectIndex stores the files of the project, in the order they
+       were found, with their mtime, size, content hash and the classes
+       defined in them, the directories of the project with their mtime
+       and entries, the file of each class and the app class and its
+       file. Directories are valid only as long as the excludes of the
+       project and the content hash of its .gitignore, ignore_hash, are
+       unchanged.
+    '''
+
+    def __init__(self, path):
+        super(ProjectIndex, self).__init__()
+        self.path = path
+        self.clear()
+
+    def clear(self):
+        '''To remove everything stored in the index.
+        '''
+
+        self.time = 0
+        self.files = OrderedDict()
+        self.dirs = {}
+        self.classes = {}
+        self.app_class = None
+        self.app_file = None
+        self.excludes = []
+        self.ignore_hash = None
+
+    def load(self):
+        '''To load the index from self.path. Returns False if the file
+           doesn't exist, cannot be parsed or has been written by another
+           version.
+        '''
+
+        self.clear()
+        try:
+            f = open(self.path, 'r')
+            data = json.load(f)
+            f.close()
+        except (IOError, ValueError):
+            return False
+
+        if not isinstance(data, dict) or \
+                data.get('version') != PROJECT_INDEX_VERSION:
+            return False
+
+        try:
+            self.time = float(data['time'])
+            self.files = OrderedDict((entry['path'], entry)
+                                     for entry in data['files'])
+            self.dirs = dict((entry['path'], entry)
+                             for entry in data['dirs'])
+            self.classes = dict(data['classes'])
+            self.app_class = data['app']['class']
+            self.app_file = data['app']['file']
+            self.excludes = list(data['excludes'])
+            self.ignore_hash = data['ignore_hash']
+        except (KeyError, TypeError, ValueError):
+            self.clear()
+            return False
+
+        return True
+
+    def save(self):
+        '''To save the index to self.path.
+        '''
+
+        _dir = os.path.dirname(self.path)
+        if not os.path.exists(_dir):
+            os.makedirs(_dir)
+
+        self.time = time.time()
+        data = {'version': PROJECT_INDEX_VERSION,
+                'time': self.time,
+                'files': list(self.files.values()),
+                'dirs': list(self.dirs.values()),
+                'classes': self.classes,
+                'app': {'class': self.app_class, 'file': self.app_file},
+                'excludes': self.excludes,
+                'ignore_hash': self.ignore_hash}
+
+        f = open(self.path, 'w')
+        json.dump(data, f, indent=1, sort_keys=True)
+        f.close()
+
+    def add_file(self, path, info=None):
+        '''To record the current mtime, size and content hash of path.
+           Items of info, if given, are stored along with them.
+        '''
+
+        stat = get_file_stat(path)
+        if stat is not None:
+            if info:
+                stat.update(info)
+            self.files[path] = stat
+
+    def get_file(self, path):
+        '''Returns what has been recorded for path if it hasn't been
+           modified since, None otherwise.
+        '''
+
+        if self.is_file_modified(path):
+            return None
+
+        return self.files[path]
+
+    def get_dir(self, path, mtime=None):
+        '''Returns what has been recorded for directory path if its list of
+           entries hasn't changed since, None otherwise. mtime is the
+           current mtime of path, if it is already known.
+        '''
+
+        recorded = self.dirs.get(path)
+        if recorded is None:
+            return None
+
+        try:
+            if mtime is None:
+                mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        if mtime != recorded['mtime']:
+            return None
+
+        return recorded
+
+    def is_file_modified(self, path):
+        '''Returns True if path has been modified since it was recorded.
+           Content hash is compared only when mtime or size differ.
+        '''
+
+        recorded = self.files.get(path)
+        if recorded is None:
+            return True
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return True
+
+        if stat.st_mtime == recorded['mtime'] and \
+                stat.st_size == recorded['size']:
+            return False
+
+        current = get_file_stat(path)
+        return current is None or current['hash'] != recorded['hash']
@@ -2,11 +2,12 @@ import re
 import os
 import sys
 import inspect
-import time
 import functools
 import shutil
 import imp
 
+from collections import OrderedDict
+
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.floatlayout import FloatLayout
@@ -16,15 +17,25 @@ from kivy.factory import Factory, FactoryException
 from kivy.properties import ObjectProperty
 from kivy.lang import Builder
 from kivy.uix.sandbox import Sandbox
-from kivy.clock import Clock
+from kivy.config import ConfigParser
 
 from designer.helper_functions import get_indentation, get_indent_str,\
-    get_line_start_pos, get_kivy_designer_dir
+    get_line_start_pos, get_kivy_designer_dir, write_atomic
 from designer.proj_watcher import ProjectWatcher
+from designer.kv_cache import KVCache
+from designer.kv_parser import parse_kv, get_node_text
+from designer.project_index import ProjectIndex, get_file_stat
+from designer.class_finder import find_classes
+from designer.project_walker import walk_project
+from designer.auto_save import AutoSave
+from designer.save_worker import SaveWorker
+from designer.widget_classifier import WidgetClassifier
 
 PROJ_DESIGNER = '.designer'
 KV_PROJ_FILE_NAME = os.path.join(PROJ_DESIGNER, 'kvproj')
 PROJ_FILE_CONFIG = os.path.join(PROJ_DESIGNER, 'file_config.ini')
+PROJ_SETTINGS_CONFIG = os.path.join(PROJ_DESIGNER, 'config.ini')
+KV_CACHE_FILE_NAME = os.path.join(PROJ_DESIGNER, 'kv_cache')
 
 
 class Comment(object):
@@ -73,6 +84,33 @@ class RootRule(ClassRule):
         self.widget = widget
 
 
+class LazyModule(object):
+    '''LazyModule is a deferred handle to the module of a project file.
+       The file is imported by :meth:`load` when the module is first
+       needed, or when one of its attributes is accessed.
+    '''
+
+    def __init__(self, project_loader, _file, fromlist):
+        super(LazyModule, self).__init__()
+        self.project_loader = project_loader
+        self.file = _file
+        self.fromlist = fromlist
+        self.module = None
+
+    def load(self):
+        '''To import the module if it hasn't been imported and return it.
+        '''
+
+        if self.module is None:
+            self.module = self.project_loader._import_file(self.file,
+                                                           self.fromlist)
+
+        return self.module
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+
 class ProjectLoaderException(Exception):
     pass
 
@@ -96,31 +134,83 @@ class ProjectLoader(object):
         self.file_list = []
         self.proj_dir = ""
         self._is_root_already_in_factory = False
+        self.kv_cache = None
+        self.proj_index = None
+        self._kv_rules = {}
+        self._file_info = {}
+        self._dirs = {}
+        self._lazy_modules = {}
+        self._rule_widgets = {}
+        self._kv_rule_widgets = {}
+        self.lazy_import = True
+        self.proj_excludes = []
+        self.proj_ignore_hash = None
+        self.auto_save = None
+        self._auto_save_snapshot = None
+        self._saved_kv = None
+        self.save_worker = SaveWorker()
+        self._saving = False
+        self.statusbar = None
+        # Changed whenever the classes of the project may have been
+        # reloaded, so that what is known about them is discarded
+        self.classes_version = 0
+        self.widget_classifier = WidgetClassifier()
+
+    def _get_proj_excludes(self, path):
+        '''To get the list of patterns of paths excluded from the project
+           in directory path, from its project settings.
+        '''
 
-    def _get_file_list(self, path):
-        '''This function is recursively called for loading all py file files
-           in the current directory.
+        config_parser = ConfigParser()
+        config_parser.read(os.path.join(path, PROJ_SETTINGS_CONFIG))
+        excludes = config_parser.getdefault('files', 'exclude', '')
+        return [pattern.strip() for pattern in excludes.split(',')
+                if pattern.strip()]
+
+    def update_proj_excludes(self):
+        '''To apply the patterns excluded by the project's settings, once
+           they have been changed, to the changes watched. They are applied
+           to the files of the project when it is loaded again.
         '''
 
-        file_list = []
-        if '.designer' in path:
-            return []
+        self.proj_watcher.set_excludes(self._get_proj_excludes(self.proj_dir))
 
-        sys.path.insert(0, path)
-        self._dir_list.append(path)
-        for _file in os.listdir(path):
-            file_path = os.path.join(path, _file)
-            if os.path.isdir(file_path):
-                file_list += self._get_file_list(file_path)
-            else:
-                # Consider only kv, py and buildozer(spec) files
-                if file_path[file_path.rfind('.'):] in [".py", ".spec"]:
-                    if os.path.dirname(file_path) == self.proj_dir:
-                        file_list.insert(0, file_path)
-                    else:
-                        file_list.append(file_path)
+    def _iter_file_list(self, path):
+        '''To iterate over all the py and spec files in directory path,
+           using :func:`~designer.project_walker.walk_project`. Entries of
+           directories which haven't changed since the project was recorded
+           are taken from self.proj_index instead of being listed again.
+        '''
+
+        excludes = self._get_proj_excludes(path)
+        self.proj_excludes = excludes
+        # Directories are listed again if .gitignore has changed
+        stat = get_file_stat(os.path.join(path, '.gitignore'))
+        ignore_hash = stat['hash'] if stat else None
+        self.proj_ignore_hash = ignore_hash
+
+        get_recorded_dir = None
+        if self.proj_index and self.proj_index.excludes == excludes and \
+                self.proj_index.ignore_hash == ignore_hash:
+            get_recorded_dir = self.proj_index.get_dir
+
+        for _dir, mtime, dirs, files in walk_project(
+                path, excludes, get_recorded_dir=get_recorded_dir):
+            self._dirs[_dir] = {'path': _dir, 'mtime': mtime,
+                                'dirs': dirs, 'files': files}
+            if any(_file.endswith('.py') for _file in files):
+                sys.path.insert(0, _dir)
+                self._dir_list.append(_dir)
+
+            for _file in files:
+                yield _file
+
+    def _get_file_list(self, path):
+        '''To get the list of all the py and spec files in directory path.
+           Files of path come first.
+        '''
 
-        return file_list
+        return list(self._iter_file_list(path))
 
     def add_custom_widget(self, py_path):
         '''This function is used to add a custom widget given path to its
@@ -152,6 +242,7 @@ class ProjectLoader(object):
                 app_str[:get_indentation(app_str)] + '#' + app_str.lstrip())
 
         Builder.load_string(kv_string)
+        self.classes_version += 1
 
         sys.path.insert(0, os.path.dirname(kv_path))
 
@@ -222,6 +313,8 @@ class ProjectLoader(object):
             text += f.read() + '\n'
             f.close()
 
+        # It is the text shown by KVLangArea, as saved
+        self._saved_kv = (self.proj_dir, text)
         return text
 
     def load_new_project(self, kv_path):
@@ -238,7 +331,7 @@ class ProjectLoader(object):
         ret = self._load_project(kv_path)
         self.new_project = False
         # Add project_dir to watch
-        self.proj_watcher.start_watching(self.proj_dir)
+        self.proj_watcher.start_watching(self.proj_dir, self.proj_excludes)
         return ret
 
     def _load_project(self, kv_path):
@@ -254,9 +347,16 @@ class ProjectLoader(object):
         sys.path.insert(0, parent_proj_dir)
 
         self.class_rules = []
+        self._kv_rules = {}
+        self._rule_widgets = {}
+        self._kv_rule_widgets = {}
         all_files_loaded = True
         _file = None
 
+        self.kv_cache = KVCache(os.path.join(self.proj_dir,
+                                             KV_CACHE_FILE_NAME))
+        self.kv_cache.load()
+
         for _file in os.listdir(self.proj_dir):
             # Load each kv file in the directory
             _file = os.path.join(self.proj_dir, _file)
@@ -265,37 +365,28 @@ class ProjectLoader(object):
 
             self.kv_file_list.append(_file)
 
-            f = open(_file, 'r')
-            kv_string = f.read()
-            f.close()
-
-            # Remove all the 'app' lines
-            for app_str in re.findall(r'.+app+.+', kv_string):
-                kv_string = kv_string.replace(
-                    app_str,
-                    app_str[:get_indentation(app_str)] +
-                    '#' + app_str.lstrip())
+            kv_info = self._load_kv_info(_file)
+            kv_string = kv_info['kv_string']
+            for name, widgets in kv_info['rule_widgets'].items():
+                self._rule_widgets.setdefault(name, set()).update(widgets)
 
             # Get all the class_rules
-            for class_str in re.findall(r'<+([\w_]+)>', kv_string):
+            for class_str in kv_info['class_rules']:
                 class_rule = ClassRule(class_str)
                 class_rule.kv_file = _file
                 self.class_rules.append(class_rule)
 
             try:
-                root_name = re.findall(r'^([\w\d_]+)\:', kv_string,
-                                       re.MULTILINE)
+                root_name = kv_info['root_name']
 
-                if root_name != []:
+                if root_name:
                     # It will occur when there is a root rule and it can't
                     # be loaded by Builder because the its file
                     # has been imported
-                    root_name = root_name[0]
                     if not hasattr(Factory, root_name):
-                        match = re.search(r'^([\w\d_]+)\:', kv_string,
-                                          re.MULTILINE)
-                        kv_string = kv_string[:match.start()] + \
-                            '<' + root_name + '>:' + kv_string[match.end():]
+                        start, end = kv_info['root_span']
+                        kv_string = kv_string[:start] + \
+                            '<' + root_name + '>:' + kv_string[end:]
                         self.root_rule = RootRule(root_name, None)
                         self.root_rule.kv_file = _file
                         self._root_rule = self.root_rule
@@ -306,8 +397,7 @@ class ProjectLoader(object):
                 else:
                     self._is_root_already_in_factory = False
 
-                root_rule = Builder.load_string(re.sub(r'\s+on_\w+:\w+',
-                                                       '', kv_string))
+                root_rule = Builder.load_string(kv_string)
                 if root_rule:
                     self.root_rule = RootRule(root_rule.__class__.__name__,
                                               root_rule)
@@ -317,105 +407,37 @@ class ProjectLoader(object):
             except Exception as e:
                 all_files_loaded = False
 
+        self.kv_cache.save()
+        self.widget_classifier.set_class_rules(self.class_rules)
+
         if not all_files_loaded:
             raise ProjectLoaderException('Cannot load file "%s"' % (_file))
 
-        if os.path.exists(os.path.join(self.proj_dir, KV_PROJ_FILE_NAME)):
-            projdir_mtime = os.path.getmtime(self.proj_dir)
-
-            f = open(os.path.join(self.proj_dir, KV_PROJ_FILE_NAME), 'r')
-            proj_str = f.read()
-            f.close()
-
-            _file_is_valid = True
-            # Checking if the file is valid
-            if proj_str == '' or\
-                    proj_str.count('<files>') != proj_str.count('</files>') or\
-                    proj_str.count('<file>') != proj_str.count('</file>') or\
-                    proj_str.count('<class>') != proj_str.count('</class>'):
-                _file_is_valid = False
-
-            if _file_is_valid:
-                projdir_time = proj_str[
-                    proj_str.find('<time>') + len('<time>'):
-                    proj_str.find('</time>')]
-
-                projdir_time = float(projdir_time.strip())
-
-            if _file_is_valid and projdir_mtime <= projdir_time:
-                # Project Directory folder hasn't been modified,
-                # file list will remain same
-                self.file_list = []
-                un_modified_files = []
-                start_pos = proj_str.find('<files>')
-                end_pos = proj_str.find('</files>')
-                if start_pos != -1 and end_pos != -1:
-                    start_pos = proj_str.find('<file>', start_pos)
-                    end_pos1 = proj_str.find('</file>', start_pos)
-                    while start_pos < end_pos and start_pos != -1:
-                        _file = proj_str[
-                            start_pos + len('<file>'):end_pos1].strip()
-                        self.file_list.append(_file)
-                        if os.path.getmtime(_file) <= projdir_time:
-                            un_modified_files.append(_file)
-
-                        start_pos = proj_str.find('<file>', end_pos1)
-                        end_pos1 = proj_str.find('</file>', start_pos)
-
-                    for _file in self.file_list:
-                        _dir = os.path.dirname(_file)
-                        if _dir not in sys.path:
-                            sys.path.insert(0, _dir)
-
-                # Reload information for app
-                start_pos = proj_str.find('<app>')
-                end_pos = proj_str.find('</app>')
-                if start_pos != -1 and end_pos != -1:
-                    self._app_class = proj_str[
-                        proj_str.find('<class>', start_pos) + len('<class>'):
-                        proj_str.find('</class>', start_pos)].strip()
-                    self._app_file = proj_str[
-                        proj_str.find('<file>', start_pos) + len('<file>'):
-                        proj_str.find('</file>', start_pos)].strip()
-                    f = open(self._app_file, 'r')
-                    self._app_module = self._import_module(f.read(),
-                                                           self._app_file)
-                    f.close()
-
-                # Reload information for the files which haven't been modified
-                start_pos = proj_str.find('<classes>')
-                end_pos = proj_str.find('</classes>')
-
-                if start_pos != -1 and end_pos != -1:
-                    while start_pos < end_pos and start_pos != -1:
-                        start_pos = proj_str.find('<class>', start_pos) +\
-                            len('<class>')
-                        end_pos1 = proj_str.find('</class>', start_pos)
-                        _file = proj_str[
-                            proj_str.find('<file>', start_pos) + len('<file>'):
-                            proj_str.find('</file>', start_pos)].strip()
-
-                        if _file in un_modified_files:
-                            # If _file is un modified then assign it to
-                            # class rule with _name
-                            _name = proj_str[
-                                proj_str.find('<name>', start_pos) +
-                                len('<name>'):
-                                proj_str.find('</name>', start_pos)].strip()
-
-                            for _rule in self.class_rules:
-                                if _name == _rule.name:
-                                    _rule.file = _file
-                                    f = open(_file, 'r')
-                                    _rule.module = self._import_module(
-                                        f.read(), _file, _fromlist=[_name])
-                                    f.close()
-
-                        start_pos = proj_str.find('<class>', start_pos)
-                        end_pos1 = proj_str.find('</class>', start_pos)
-
-        if self.file_list == []:
-            self.file_list = self._get_file_list(self.proj_dir)
+        # Only the directories and files which have been modified since
+        # the project was recorded are scanned again
+        self.proj_index = ProjectIndex(os.path.join(self.proj_dir,
+                                                    KV_PROJ_FILE_NAME))
+        self.proj_index.load()
+        self._file_info = {}
+        self._dirs = {}
+        self.file_list = self._get_file_list(self.proj_dir)
+        file_set = set(self.file_list)
+
+        # Reload information for app if its file hasn't been modified
+        _file = self.proj_index.app_file
+        if self.proj_index.app_class and _file in file_set and \
+                self.proj_index.get_file(_file) is not None:
+            self._app_class = self.proj_index.app_class
+            self._app_file = _file
+            self._app_module = self._get_module(self._app_file)
+
+        # Reload information for the files which haven't been modified
+        for _rule in self.class_rules:
+            _file = self.proj_index.classes.get(_rule.name)
+            if _file in file_set and \
+                    self.proj_index.get_file(_file) is not None:
+                _rule.file = _file
+                _rule.module = self._get_module(_file, [_rule.name])
 
         # Get all files corresponding to each class
         self._get_class_files()
@@ -429,6 +451,64 @@ class ProjectLoader(object):
 
         self.load_proj_config()
 
+    def _load_kv_info(self, _file):
+        '''To read the kv file _file and get its information from
+           self.kv_cache, see :meth:`_get_kv_info`. Its rules are stored in
+           self._kv_rules and the widgets used in them in
+           self._kv_rule_widgets.
+        '''
+
+        f = open(_file, 'r')
+        kv_string = f.read()
+        f.close()
+
+        kv_info = self.kv_cache.get(kv_string)
+        if kv_info is None:
+            kv_info = self._get_kv_info(kv_string)
+            self.kv_cache.set(kv_string, kv_info)
+
+        self._kv_rules[_file] = kv_info['rules']
+        self._kv_rule_widgets[_file] = kv_info['rule_widgets']
+        return kv_info
+
+    def _get_kv_info(self, kv_string):
+        '''To get the information of kv_string which is stored in
+           :class:`~designer.kv_cache.KVCache`, i.e. the string to be loaded
+           by Builder, its class rules, its root rule, the span of each
+           of its rules and the widgets used in each of its rules.
+        '''
+
+        rules = parse_kv(kv_string)
+
+        # Remove all the 'app' lines
+        for app_str in re.findall(r'.+app+.+', kv_string):
+            kv_string = kv_string.replace(
+                app_str,
+                app_str[:get_indentation(app_str)] +
+                '#' + app_str.lstrip())
+
+        # Remove all the event handlers
+        kv_string = re.sub(r'\s+on_\w+:\w+', '', kv_string)
+
+        root_name = None
+        root_span = None
+        match = re.search(r'^([\w\d_]+)\:', kv_string, re.MULTILINE)
+        if match:
+            root_name = match.group(1)
+            root_span = [match.start(), match.end()]
+
+        return {'kv_string': kv_string,
+                'class_rules': re.findall(r'<+([\w_]+)>', kv_string),
+                'root_name': root_name,
+                'root_span': root_span,
+                'rules': [[rule.kind, rule.name, rule.lineno, rule.end_lineno]
+                          for rule in rules],
+                'rule_widgets': dict(
+                    (rule.name, sorted(set(node.name
+                                           for node in rule.iter_nodes()
+                                           if node is not rule)))
+                    for rule in rules)}
+
     def load_proj_config(self):
         '''To load project's config file. Project's config file is stored in
            .designer directory in project's directory.
@@ -490,67 +570,90 @@ class ProjectLoader(object):
 
     def perform_auto_save(self, *args):
         '''To perform auto save. Auto Save is done after every 5 min.
+           Only the kv text and the opened py files which have changed
+           since they were last saved are written to the
+           :class:`~designer.auto_save.AutoSave` journal, by
+           :class:`~designer.save_worker.SaveWorker`.
         '''
 
         if not self.root_rule:
             return
 
-        auto_save_dir = os.path.join(self.proj_dir, '.designer')
-        auto_save_dir = os.path.join(auto_save_dir, 'auto_save')
+        # A save is in progress, project will be saved anyway
+        if self.save_worker.is_busy():
+            return
 
-        if not os.path.exists(auto_save_dir):
-            os.makedirs(auto_save_dir)
+        if not self.auto_save or self.auto_save.proj_dir != self.proj_dir:
+            self.auto_save = AutoSave(self.proj_dir)
+            self._auto_save_snapshot = None
 
-        else:
-            shutil.rmtree(auto_save_dir)
-            os.mkdir(auto_save_dir)
+        snapshot = (self.root_rule.kv_file, self.kv_code_input.text,
+                    tuple((_code_input.rel_file_path, _code_input.text)
+                          for _code_input in
+                          self.tab_pannel.list_py_code_inputs))
 
-        for _file in os.listdir(self.proj_dir):
-            if '.designer' in _file:
-                continue
+        # Nothing has changed since last auto save
+        if snapshot == self._auto_save_snapshot:
+            return
 
-            old_file = os.path.join(self.proj_dir, _file)
-            new_file = os.path.join(auto_save_dir, _file)
-            if os.path.isdir(old_file):
-                shutil.copytree(old_file, new_file)
-            else:
-                shutil.copy(old_file, new_file)
+        # Buffers are built here, the project can change while the worker
+        # writes them
+        try:
+            buffers = self.get_auto_save_buffers(snapshot)
+        except (IOError, OSError) as e:
+            self._on_auto_save_failed(e)
+            return
 
-        root_rule_file = os.path.join(auto_save_dir,
-                                      os.path.basename(self.root_rule.kv_file))
-        f = open(root_rule_file, 'r')
-        _file_str = f.read()
-        f.close()
+        self._auto_save_snapshot = snapshot
+        auto_save = self.auto_save
+        self.save_worker.submit(lambda: auto_save.save(buffers),
+                                on_failure=self._on_auto_save_failed)
 
-        text = self.kv_code_input.text
+    def _on_auto_save_failed(self, error):
+        '''Called on the main thread when auto save couldn't be written.
+        '''
+
+        self._auto_save_snapshot = None
+        if self.statusbar:
+            self.statusbar.show_message('Cannot auto save project: %s' %
+                                        (str(error)))
+
+    def get_auto_save_buffers(self, snapshot):
+        '''Returns a dict mapping the path, relative to project's
+           directory, of the root rule's kv file and of the opened py files
+           to their text in snapshot, as taken by :meth:`perform_auto_save`.
+        '''
+
+        kv_file, kv_text, py_texts = snapshot
+        buffers = {}
 
-        root_str = self.get_root_str()
-        f = open(root_rule_file, 'w')
-        _file_str = _file_str.replace(root_str, text)
-        f.write(_file_str)
+        f = open(kv_file, 'r')
+        _file_str = f.read()
         f.close()
 
-        # For custom widgets copy py and kv file
-        for widget in self.custom_widgets:
-            custom_kv = os.path.join(auto_save_dir,
-                                     os.path.basename(widget.kv_file))
-            if not os.path.exists(custom_kv):
-                shutil.copy(widget.kv_file, custom_kv)
+        root_str = self.get_root_str(_file_str)
+        rel_path = os.path.relpath(kv_file, self.proj_dir)
+        buffers[rel_path] = _file_str.replace(root_str, kv_text)
 
-            custom_py = os.path.join(auto_save_dir,
-                                     os.path.basename(widget.py_file))
-            if not os.path.exists(custom_py):
-                shutil.copy(widget.py_file, custom_py)
+        for rel_file_path, text in py_texts:
+            buffers[rel_file_path] = text
+
+        return buffers
 
-    def save_project(self, proj_dir=''):
+    def save_project(self, proj_dir='', on_success=None, on_failure=None):
         '''To save project to proj_dir. If proj_dir is not empty string then
            project is saved to a new directory other than its
            current directory and otherwise it is saved to the
            current directory.
+           Files are written by :class:`~designer.save_worker.SaveWorker`,
+           on_success is called once they have been written and on_failure
+           with the exception if they couldn't. ProjectLoaderException is
+           raised if the save worker is busy.
         '''
 
-        # To stop ProjectWatcher from emitting event when project is saved
-        self.proj_watcher.allow_event_dispatch = False
+        if self._saving or self.save_worker.is_busy():
+            raise ProjectLoaderException('Project is already being saved')
+
         proj_dir_changed = False
 
         if self.new_project:
@@ -648,24 +751,56 @@ class ProjectLoader(object):
 
                 self.proj_dir = proj_dir
 
+        plan = self._plan_save()
+        plan['needs_reload'] = plan['needs_reload'] or proj_dir_changed
+        self._saving = True
+        self.save_worker.submit(
+            functools.partial(self._write_save, plan['writes'],
+                              plan['copies']),
+            on_success=functools.partial(self._on_project_saved, plan,
+                                         on_success),
+            on_failure=functools.partial(self._on_save_failed, on_failure))
+
+    def _plan_save(self):
+        '''To compute, on the main thread, what has to be written to save
+           the project. Only the py files and the kv rules which have been
+           modified since the project was saved are written. Returns a dict
+           with the new content of each file to be written as 'writes', the
+           list of (source, destination) files to be copied as 'copies', the
+           list of (text, file, fromlist) py files to be imported again once
+           they have been written as 'imports', the list of (code_input,
+           text) saved as 'saved_inputs', the saved kv text as 'kv_text',
+           if the project needs to be reloaded as 'needs_reload' and the
+           texts being saved, see :meth:`_get_save_snapshot`, as
+           'snapshot'.
+        '''
+
+        writes = OrderedDict()
+        copies = []
+        imports = []
+        saved_inputs = []
+        needs_reload = False
+
         # For custom widgets copy py and kv file to project directory
         for widget in self.custom_widgets:
             custom_kv = os.path.join(self.proj_dir,
                                      os.path.basename(widget.kv_file))
             if not os.path.exists(custom_kv):
-                shutil.copy(widget.kv_file, custom_kv)
+                copies.append((widget.kv_file, custom_kv))
 
             custom_py = os.path.join(self.proj_dir,
                                      os.path.basename(widget.py_file))
             if not os.path.exists(custom_py):
-                shutil.copy(widget.py_file, custom_py)
+                copies.append((widget.py_file, custom_py))
 
-        # Saving all opened py files and also reimport them
+        # Saving all modified py files and also reimport them
         for _code_input in self.tab_pannel.list_py_code_inputs:
+            if not _code_input.is_dirty():
+                continue
+
             path = os.path.join(self.proj_dir, _code_input.rel_file_path)
-            f = open(path, 'w')
-            f.write(_code_input.text)
-            f.close()
+            writes[path] = _code_input.text
+            saved_inputs.append((_code_input, _code_input.text))
             _from_list = []
             for rule in self.class_rules:
                 if rule.file == path:
@@ -677,24 +812,30 @@ class ProjectLoader(object):
 
             # Ignore all types that are not .py
             if path.endswith(".py"):
-                self._import_module(_code_input.text, path,
-                                    _fromlist=_from_list)
+                imports.append((_code_input.text, path, _from_list))
 
-        # Save all class rules
+        # Save all modified class rules
         text = self.kv_code_input.text
+        dirty_rules = self._get_dirty_rules(text)
+        if dirty_rules is None or \
+                set(rule[1] for rule in dirty_rules) - \
+                set(_rule.name for _rule in self.class_rules) - \
+                set([self.root_rule.name]):
+            # Rules have been added, project has to be loaded again
+            needs_reload = True
+
         for _rule in self.class_rules:
+            if dirty_rules is not None and \
+                    ('class', _rule.name) not in dirty_rules:
+                continue
+
             # Get the kv text from KVLangArea and write it to class rule's file
-            f = open(_rule.kv_file, 'r')
-            _file_str = f.read()
-            f.close()
+            _file_str = self._read_for_save(writes, _rule.kv_file)
 
             old_str = self.get_class_str_from_text(_rule.name, _file_str)
             new_str = self.get_class_str_from_text(_rule.name, text)
 
-            f = open(_rule.kv_file, 'w')
-            _file_str = _file_str.replace(old_str, new_str)
-            f.write(_file_str)
-            f.close()
+            writes[_rule.kv_file] = _file_str.replace(old_str, new_str)
 
         # If root widget is not changed
         if self._root_rule.name == self.root_rule.name:
@@ -705,10 +846,11 @@ class ProjectLoader(object):
                     is_root_class = True
                     break
 
-            if not is_root_class:
-                f = open(self.root_rule.kv_file, 'r')
-                _file_str = f.read()
-                f.close()
+            if not is_root_class and \
+                    (dirty_rules is None or
+                     ('root', self.root_rule.name) in dirty_rules):
+                _file_str = self._read_for_save(writes,
+                                                self.root_rule.kv_file)
 
                 old_str = self.get_class_str_from_text(self.root_rule.name,
                                                        _file_str,
@@ -716,18 +858,15 @@ class ProjectLoader(object):
                 new_str = self.get_class_str_from_text(self.root_rule.name,
                                                        text, is_class=False)
 
-                f = open(self.root_rule.kv_file, 'w')
-                _file_str = _file_str.replace(old_str, new_str)
-                f.write(_file_str)
-                f.close()
+                writes[self.root_rule.kv_file] = _file_str.replace(old_str,
+                                                                   new_str)
 
         else:
             # If root widget is changed
             # Root Widget changes, there can be these cases:
+            needs_reload = True
             root_name = self.root_rule.name
-            f = open(self._app_file, 'r')
-            file_str = f.read()
-            f.close()
+            file_str = self._read_for_save(writes, self._app_file)
             self._root_rule = self.root_rule
 
             if self.is_root_a_class_rule() and self._app_file:
@@ -764,9 +903,7 @@ class ProjectLoader(object):
                                       'runTouchApp(' + root_name + '())',
                                       file_str)
 
-                f = open(self._app_file, 'w')
-                f.write(file_str)
-                f.close()
+                writes[self._app_file] = file_str
 
             else:
                 # Root Widget's rule is not a custom class
@@ -781,16 +918,13 @@ class ProjectLoader(object):
                             self.root_rule.kv_file = _file
                             break
 
-                f = open(self.root_rule.kv_file, 'r')
-                _file_str = f.read()
-                f.close()
+                _file_str = self._read_for_save(writes,
+                                                self.root_rule.kv_file)
 
                 new_str = self.get_class_str_from_text(self.root_rule.name,
                                                        text, False)
 
-                f = open(self.root_rule.kv_file, 'a')
-                f.write(new_str)
-                f.close()
+                writes[self.root_rule.kv_file] = _file_str + new_str
 
                 if self._app_class != 'runTouchApp':
                     s = re.search(r'class\s+%s.+:' % self._app_class, file_str)
@@ -831,12 +965,114 @@ class ProjectLoader(object):
                             file_str = file_str.replace(file_str[start:end],
                                                         '    pass')
 
-                            f = open(self._app_file, 'w')
-                            f.write(file_str)
-                            f.close()
+                            writes[self._app_file] = file_str
+
+        if imports:
+            needs_reload = True
+
+        return {'writes': writes, 'copies': copies, 'imports': imports,
+                'saved_inputs': saved_inputs, 'kv_text': text,
+                'needs_reload': needs_reload,
+                'snapshot': self._get_save_snapshot()}
+
+    def _get_save_snapshot(self):
+        '''Returns the kv text and the text of each opened py file, to find
+           out if they have been modified while the project was being
+           saved.
+        '''
+
+        return (self.kv_code_input.text,
+                tuple((_code_input, _code_input.text)
+                      for _code_input in self.tab_pannel.list_py_code_inputs))
+
+    def _get_rule_texts(self, text):
+        '''Returns a dict mapping the (kind, name) of each rule of text to
+           its text.
+        '''
 
-        # Allow Project Watcher to emit events
-        Clock.schedule_once(self._allow_proj_watcher_dispatch, 1)
+        lines = text.splitlines()
+        return dict(((rule.kind, rule.name), get_node_text(lines, rule))
+                    for rule in parse_kv(text))
+
+    def _get_dirty_rules(self, text):
+        '''Returns the set of (kind, name) of the rules of text which differ
+           from the last saved kv text. None if it isn't known, then all the
+           rules have to be saved.
+        '''
+
+        if not self._saved_kv or self._saved_kv[0] != self.proj_dir:
+            return None
+
+        old_rules = self._get_rule_texts(self._saved_kv[1])
+        new_rules = self._get_rule_texts(text)
+        return set(key for key in set(old_rules) | set(new_rules)
+                   if old_rules.get(key) != new_rules.get(key))
+
+    def _read_for_save(self, writes, path):
+        '''Returns the content of path which will be written by the save
+           being planned, its content on disk if it isn't written.
+        '''
+
+        if path in writes:
+            return writes[path]
+
+        f = open(path, 'r')
+        s = f.read()
+        f.close()
+        return s
+
+    def _write_save(self, writes, copies):
+        '''To write the files of a planned save. It runs on the save
+           worker's thread, each file is written atomically. Writes are
+           recorded by ProjectWatcher, so that they aren't taken for
+           changes made outside Designer.
+        '''
+
+        for src, dest in copies:
+            f = open(src, 'rb')
+            self.proj_watcher.record_write(dest, f.read())
+            f.close()
+            shutil.copy(src, dest)
+
+        for path, content in writes.items():
+            self.proj_watcher.record_write(path, content)
+            write_atomic(path, content)
+
+        return list(writes.keys())
+
+    def _on_project_saved(self, plan, callback, *args):
+        '''Called on the main thread when the files of the project have been
+           written. It imports the saved py files again. callback is called
+           with True if the project has to be loaded again and with True
+           if it has been modified while it was being saved.
+        '''
+
+        self._saving = False
+        for s, _file, _fromlist in plan['imports']:
+            self._import_module(s, _file, _fromlist=_fromlist)
+
+        for _code_input, text in plan['saved_inputs']:
+            _code_input.saved_text = text
+
+        self._saved_kv = (self.proj_dir, plan['kv_text'])
+
+        # Everything auto saved has now been saved
+        if self.auto_save:
+            self.auto_save.clear()
+            self.auto_save = None
+
+        if callback:
+            callback(plan['needs_reload'],
+                     self._get_save_snapshot() != plan['snapshot'])
+
+    def _on_save_failed(self, callback, error):
+        '''Called on the main thread when the files of the project could not
+           be written.
+        '''
+
+        self._saving = False
+        if callback:
+            callback(error)
 
     def get_class_str_from_text(self, class_name, _file_str, is_class=True):
         '''To return the full class rule of class_name from _file_str
@@ -888,57 +1124,57 @@ class ProjectLoader(object):
         old_str = _file_str[start_pos: end_pos]
         return old_str
 
-    def _allow_proj_watcher_dispatch(self, *args):
-        '''To start project_watcher to start watching self.proj_dir
+    def _update_file_info(self):
+        '''To get the names of the classes defined in each file of
+           self.file_list and its App class. They are taken from
+           self.proj_index for the files which haven't been modified since
+           the project was recorded, other files are parsed in parallel
+           by :func:`~designer.class_finder.find_classes`.
         '''
 
-        self.proj_watcher.allow_event_dispatch = True
-        # self.proj_watcher.start_watching(self.proj_dir)
+        to_scan = []
+        for _file in self.file_list:
+            if _file in self._file_info:
+                continue
 
-    def _app_in_string(self, s):
-        '''To determine if there is an App class or runTouchApp
-           defined/used in string s.
-        '''
+            recorded = None
+            if self.proj_index:
+                recorded = self.proj_index.get_file(_file)
 
-        if 'runTouchApp' in s:
-            self._app_class = 'runTouchApp'
-            return True
-
-        elif 'kivy.app' in s:
-            for _class in re.findall(r'\bclass\b.+:', s):
-                b_index1 = _class.find('(')
-                b_index2 = _class.find(')')
-                if _class[b_index1 + 1:b_index2].strip() == 'App':
-                    self._app_class = _class[_class.find(' '):b_index1].strip()
-                    return True
+            if recorded is not None and 'classes' in recorded:
+                self._file_info[_file] = {
+                    'classes': recorded['classes'],
+                    'app_class': recorded['app_class']}
+            else:
+                to_scan.append(_file)
 
-        return False
+        self._file_info.update(find_classes(to_scan))
 
     def _get_class_files(self):
         '''To search through all detected class rules and find
            their python files and to search for app.
         '''
+
+        self._update_file_info()
+
         if self._app_file is None:
-            # Search for main.py
+            # Search for main.py, then for a file with app in its name
+            # and then in every file
+            main_files = []
+            app_files = []
             for _file in self.file_list:
-                if _file[_file.rfind('/') + 1:] == 'main.py':
-                    f = open(_file, 'r')
-                    s = f.read()
-                    f.close()
-                    if self._app_in_string(s):
-                        self._app_module = self._import_module(s, _file)
-                        self._app_file = _file
-
-            # Search for a file with app in its name
-            if not self._app_class:
-                for _file in self.file_list:
-                    if 'app' in _file[_file.rfind('/'):]:
-                        f = open(_file, 'r')
-                        s = f.read()
-                        f.close()
-                        if self._app_in_string(s):
-                            self._app_module = self._import_module(s, _file)
-                            self._app_file = _file
+                if os.path.basename(_file) == 'main.py':
+                    main_files.append(_file)
+                elif 'app' in os.path.basename(_file):
+                    app_files.append(_file)
+
+            for _file in main_files + app_files + self.file_list:
+                app_class = self._file_info[_file]['app_class']
+                if app_class:
+                    self._app_class = app_class
+                    self._app_module = self._get_module(_file)
+                    self._app_file = _file
+                    break
 
         to_find = []
         for _rule in self.class_rules:
@@ -948,25 +1184,32 @@ class ProjectLoader(object):
         if self.root_rule:
             to_find.append(self.root_rule)
 
-        # If cannot find due to above methods, search every file
+        # Index of the files defining each class
+        class_files = {}
         for _file in self.file_list:
-            f = open(_file, 'r')
-            s = f.read()
-            f.close()
-            if not self._app_file and self._app_in_string(s):
-                self._app_module = self._import_module(s, _file)
-                self._app_file = _file
+            for class_name in self._file_info[_file]['classes']:
+                class_files.setdefault(class_name, []).append(_file)
 
-            for _rule in to_find[:]:
-                if _rule.file:
-                    continue
+        # Rules to be resolved by each file, only these files are imported
+        file_rules = {}
+        for _rule in to_find:
+            for _file in class_files.get(_rule.name, []):
+                file_rules.setdefault(_file, []).append(_rule)
 
-                if re.search(r'\bclass\s*%s+.+:' % (_rule.name), s):
-                    mod = self._import_module(s, _file, _fromlist=[_rule.name])
-                    if hasattr(mod, _rule.name):
-                        _rule.file = _file
-                        to_find.remove(_rule)
-                        _rule.module = mod
+        for _file in self.file_list:
+            rules = [_rule for _rule in file_rules.get(_file, [])
+                     if not _rule.file]
+            if not rules:
+                continue
+
+            mod = self._get_module(_file, [_rule.name for _rule in rules])
+            for _rule in rules:
+                # A LazyModule is not imported to check it, class_finder
+                # has found the class at the top level of _file
+                if isinstance(mod, LazyModule) or hasattr(mod, _rule.name):
+                    _rule.file = _file
+                    to_find.remove(_rule)
+                    _rule.module = mod
 
         # Cannot Find App, So, use default runTouchApp
         if not self._app_file:
@@ -983,6 +1226,64 @@ class ProjectLoader(object):
             raise ProjectLoaderException(
                 'Cannot find class files for all classes')
 
+    def _import_file(self, _file, _fromlist=[]):
+        '''To import the module of _file.
+        '''
+
+        f = open(_file, 'r')
+        s = f.read()
+        f.close()
+        return self._import_module(s, _file, _fromlist=_fromlist)
+
+    def _get_module(self, _file, _fromlist=[]):
+        '''Returns the module of _file. If self.lazy_import is True then it
+           returns a :class:`LazyModule`, shared by all the rules of _file,
+           otherwise _file is imported.
+        '''
+
+        if not self.lazy_import:
+            return self._import_file(_file, _fromlist)
+
+        module = self._lazy_modules.get(_file)
+        if module is None:
+            module = LazyModule(self, _file, list(_fromlist))
+            self._lazy_modules[_file] = module
+        else:
+            module.fromlist.extend(name for name in _fromlist
+                                   if name not in module.fromlist)
+
+        return module
+
+    def load_class_module(self, class_name, _loaded=None):
+        '''To import the module of the rule of class_name and of the rules
+           of the widgets used in it, if they haven't been imported.
+        '''
+
+        if _loaded is None:
+            _loaded = set()
+
+        if class_name in _loaded:
+            return
+
+        _loaded.add(class_name)
+        for _rule in self.class_rules + [self.root_rule]:
+            if _rule and _rule.name == class_name and \
+                    isinstance(_rule.module, LazyModule):
+                _rule.module.load()
+
+        for name in self._rule_widgets.get(class_name, []):
+            self.load_class_module(name, _loaded)
+
+    def _load_modules_for_str(self, kv_str):
+        '''To import the modules of the rules of the widgets used in
+           kv_str.
+        '''
+
+        _loaded = set()
+        for rule in parse_kv(kv_str):
+            for node in rule.iter_nodes():
+                self.load_class_module(node.name, _loaded)
+
     def _import_module(self, s, _file, _fromlist=[]):
         module = None
         import_from_s = False
@@ -992,6 +1293,7 @@ class ProjectLoader(object):
             import_from_s = True
 
         run_pos = s.rfind('().run()')
+        i = 0
 
         if run_pos != -1:
             run_pos -= 1
@@ -1028,6 +1330,8 @@ class ProjectLoader(object):
         if stop_watcher:
             self.proj_watcher.stop()
 
+        self.classes_version += 1
+
         # Remove all class rules and root rules of previous project
         rules = []
 
@@ -1063,7 +1367,15 @@ class ProjectLoader(object):
         self.kv_file_list = []
         self.file_list = []
         self._dir_list = []
+        self._kv_rules = {}
+        self._file_info = {}
+        self._dirs = {}
+        self._lazy_modules = {}
+        self._rule_widgets = {}
+        self._kv_rule_widgets = {}
+        self.proj_index = None
         self.class_rules = []
+        self.widget_classifier.set_class_rules([])
         self.list_comments = []
         self.custom_widgets = []
         self.dict_file_type_and_path = {}
@@ -1080,7 +1392,11 @@ class ProjectLoader(object):
         if not reload_app and self._app:
             return self._app
 
-        for name, obj in inspect.getmembers(self._app_module):
+        module = self._app_module
+        if isinstance(module, LazyModule):
+            module = module.load()
+
+        for name, obj in inspect.getmembers(module):
             if inspect.isclass(obj) and self._app_class == name:
                 self._app = obj()
                 return self._app
@@ -1088,6 +1404,147 @@ class ProjectLoader(object):
         # if still couldn't get app, although that shouldn't happen
         return None
 
+    def _get_root_rule_names(self):
+        '''Returns the sorted list of the names of the root rules of the kv
+           files of the project.
+        '''
+
+        return sorted(rule[1] for rules in self._kv_rules.values()
+                      for rule in rules if rule[0] == 'root')
+
+    def _unload_class_rule(self, class_name):
+        '''To remove the class rule of class_name from Builder.
+        '''
+
+        for _tuple in Builder.rules[:]:
+            if _tuple[1].name == '<' + class_name + '>':
+                Builder.rules.remove(_tuple)
+
+    def hot_reload(self, changes):
+        '''To reload only the kv files and the modules changed by changes,
+           a :class:`~designer.proj_watcher.ProjectChanges`, instead of
+           loading the whole project again. Returns None if the whole
+           project has to be loaded again, i.e. when the file of the root
+           rule has been removed, the root rule has changed or a changed
+           py file is neither the file of a rule nor the app's. Otherwise
+           returns a dict telling if 'kv' files, 'modules' and
+           'class_rules' have been reloaded. Text of the kv files is to
+           be reloaded by the caller, from :meth:`get_full_str`.
+        '''
+
+        deleted = changes.get_paths('deleted')
+        root_rule = self.root_rule
+        if root_rule is None or root_rule.kv_file in deleted or \
+                root_rule.file in deleted:
+            return None
+
+        # The modules using another changed module, e.g. a new one or a
+        # helper, are not known, they are all loaded again
+        rule_files = set(_rule.file for _rule in self.class_rules)
+        rule_files.update([root_rule.file, self._app_file])
+        if changes.py - rule_files:
+            return None
+
+        # Only the kv files of the project directory are loaded
+        proj_dir = os.path.normpath(self.proj_dir)
+        kv_files = sorted(path for path in changes.kv
+                          if os.path.normpath(os.path.dirname(path)) ==
+                          proj_dir)
+        root_names = self._get_root_rule_names()
+        old_class_rules = self.class_rules
+        kv_infos = {}
+        for _file in kv_files:
+            if _file in deleted or not os.path.exists(_file):
+                if _file in self.kv_file_list:
+                    self.kv_file_list.remove(_file)
+
+                self._kv_rules.pop(_file, None)
+                self._kv_rule_widgets.pop(_file, None)
+                continue
+
+            if _file not in self.kv_file_list:
+                self.kv_file_list.append(_file)
+
+            kv_infos[_file] = self._load_kv_info(_file)
+
+        if kv_files:
+            self.kv_cache.save()
+
+        if self._get_root_rule_names() != root_names:
+            return None
+
+        self._rule_widgets = {}
+        for rule_widgets in self._kv_rule_widgets.values():
+            for name, widgets in rule_widgets.items():
+                self._rule_widgets.setdefault(name, set()).update(widgets)
+
+        # Rules of the files which haven't changed are kept along with
+        # their modules
+        kept = dict(((_rule.kv_file, _rule.name), _rule)
+                    for _rule in old_class_rules)
+        self.class_rules = []
+        for _file in self.kv_file_list:
+            if _file not in kv_infos:
+                self.class_rules.extend(_rule for _rule in old_class_rules
+                                        if _rule.kv_file == _file)
+                continue
+
+            for class_str in kv_infos[_file]['class_rules']:
+                class_rule = kept.pop((_file, class_str), None)
+                if class_rule is None:
+                    class_rule = ClassRule(class_str)
+                    class_rule.kv_file = _file
+                self.class_rules.append(class_rule)
+
+        class_rules_changed = \
+            [_rule.name for _rule in self.class_rules] != \
+            [_rule.name for _rule in old_class_rules]
+        for _rule in old_class_rules:
+            if _rule not in self.class_rules:
+                self._unload_class_rule(_rule.name)
+
+        self.widget_classifier.set_class_rules(self.class_rules)
+
+        py_files = changes.py
+        if changes.get_paths('created') & py_files or deleted & py_files:
+            self.file_list = self._get_file_list(self.proj_dir)
+
+        modules_reloaded = False
+        for _file in py_files:
+            self._file_info.pop(_file, None)
+            self._lazy_modules.pop(_file, None)
+
+        for _rule in self.class_rules + [root_rule]:
+            if _rule.file not in py_files:
+                continue
+
+            # Class is registered again when its module is imported
+            if hasattr(Factory, _rule.name):
+                Factory.unregister(_rule.name)
+
+            _rule.file = None
+            _rule.module = None
+            modules_reloaded = True
+
+        if self._app_file in py_files:
+            self._app_file = None
+            self._app_class = None
+            self._app_module = None
+            self._app = None
+            modules_reloaded = True
+
+        if py_files or class_rules_changed:
+            # Root rule is looked up again, as when the project is loaded
+            root_rule.file = None
+            root_rule.module = None
+            self._get_class_files()
+
+        if modules_reloaded:
+            self.classes_version += 1
+
+        return {'kv': bool(kv_files), 'modules': modules_reloaded,
+                'class_rules': class_rules_changed}
+
     def reload_from_str(self, root_str):
         '''To reload from root_str
         '''
@@ -1114,6 +1571,7 @@ class ProjectLoader(object):
         # Remove all the 'app' lines
         root_str = re.sub(r'.+app+.+', '', root_str)
 
+        self._load_modules_for_str(root_str)
         root_widget = Builder.load_string(root_str)
 
         if not root_widget:
@@ -1128,6 +1586,18 @@ class ProjectLoader(object):
 
         return root_widget
 
+    def load_widget_from_str(self, widget_str):
+        '''To create a new widget from widget_str, which is the rule of a
+           single widget and its children. It is used to reload only the
+           widgets whose rules have been changed.
+        '''
+
+        # Remove all the 'app' lines
+        widget_str = re.sub(r'.+app+.+', '', widget_str)
+
+        self._load_modules_for_str(widget_str)
+        return Builder.load_string(widget_str)
+
     def is_root_a_class_rule(self):
         '''Returns True if root rule is a class rule
         '''
@@ -1205,6 +1675,7 @@ class ProjectLoader(object):
         '''To get instance of the class_name
         '''
 
+        self.load_class_module(class_name)
         self.root = getattr(Factory, class_name)()
         return self.root
 
@@ -1221,46 +1692,32 @@ class ProjectLoader(object):
            outside Kivy Designer
         '''
 
-        if not os.path.exists(os.path.join(
-                self.proj_dir, os.path.dirname(KV_PROJ_FILE_NAME))):
-            os.mkdir(os.path.join(self.proj_dir, ".designer"))
-
-        f = open(os.path.join(self.proj_dir, KV_PROJ_FILE_NAME), 'w')
-        f.close()
-
-        f = open(os.path.join(self.proj_dir, KV_PROJ_FILE_NAME), 'w')
-        proj_file_str = '<time>\n' + '    ' + str(time.time()) + '\n</time>\n'
-        proj_file_str += '<files>\n'
+        old_index = self.proj_index
+        self.proj_index = ProjectIndex(os.path.join(self.proj_dir,
+                                                    KV_PROJ_FILE_NAME))
         for _file in self.file_list:
-            proj_file_str += '    <file>\n'
-            proj_file_str += '        ' + _file
-            proj_file_str += '\n    </file>\n'
+            info = self._file_info.get(_file)
+            recorded = None
+            if old_index and _file in old_index.files:
+                recorded = old_index.get_file(_file)
+
+            if recorded is not None:
+                recorded = dict(recorded)
+                if info:
+                    recorded.update(info)
+                self.proj_index.files[_file] = recorded
+            else:
+                self.proj_index.add_file(_file, info)
 
-        proj_file_str += '</files>\n'
+        self.proj_index.dirs = dict(self._dirs)
+        self.proj_index.excludes = list(self.proj_excludes)
+        self.proj_index.ignore_hash = self.proj_ignore_hash
 
-        proj_file_str += '<classes>\n'
         for _rule in self.class_rules:
-            proj_file_str += '    <class>\n'
-            proj_file_str += '         <name>\n'
-            proj_file_str += '             ' + _rule.name
-            proj_file_str += '\n         </name>\n'
-            proj_file_str += '         <file>\n'
-            proj_file_str += '             ' + _rule.file
-            proj_file_str += '\n         </file>\n'
-            proj_file_str += '\n    </class>\n'
-
-        proj_file_str += '</classes>\n'
+            self.proj_index.classes[_rule.name] = _rule.file
 
         if self._app_class and self._app_file:
-            proj_file_str += '<app>\n'
-            proj_file_str += '    <class>\n'
-            proj_file_str += '         ' + self._app_class
-            proj_file_str += '\n    </class>\n'
-            proj_file_str += '    <file>\n'
-            proj_file_str += '         ' + self._app_file
-            proj_file_str += '\n    </file>\n'
-            proj_file_str += '</app>\n'
-
-        f.write(proj_file_str)
+            self.proj_index.app_class = self._app_class
+            self.proj_index.app_file = self._app_file
 
-        f.close()
+        self.proj_index.save()
@@ -41,12 +41,16 @@ arg =
 
 [env variables]
 env =
+
+[files]
+exclude =
 '''
             f = open(file_path, 'w')
             f.write(CONFIG_TEMPLATE)
             f.close()
 
         self.config_parser.read(file_path)
+        self.config_parser.setdefaults('files', {'exclude': ''})
         proj_prop_panel = self.create_json_panel(
             'Project Properties', self.config_parser,
             './designer/settings/proj_settings_proj_prop.json')
@@ -59,4 +63,7 @@ env =
         '''This function is default handler of on_config_change event.
         '''
         self.config_parser.write()
+        if tuple(args[1:3]) == ('files', 'exclude'):
+            self.proj_loader.update_proj_excludes()
+
         super(ProjectSettings, self).on_config_change(*args)
@@ -0,0 +1,199 @@
+'''This module contains the walker used by ProjectLoader to find the files
+   of a project. Directories are walked iteratively using the entries
+   returned by scandir, when it is available, so that no extra stat call
+   is needed to know if an entry is a directory. Paths ignored by the
+   project's .gitignore and by its exclude list are not walked.
+'''
+
+import os
+import re
+import fnmatch
+
+from collections import deque
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+DEFAULT_EXCLUDES = ['.designer', '.git', '.hg', '.svn', '.buildozer',
+                    '.tox', 'bin', '__pycache__', 'venv', '.venv']
+'''Names of the files and directories which are never walked.
+'''
+
+VENV_MARKERS = ['pyvenv.cfg']
+'''A directory containing one of these files is a virtualenv and it is not
+   walked.
+'''
+
+
+class _Entry(object):
+    '''_Entry is used in place of the entries of scandir when it is not
+       available.
+    '''
+
+    def __init__(self, path, name):
+        super(_Entry, self).__init__()
+        self.path = os.path.join(path, name)
+        self.name = name
+
+    def is_dir(self):
+        return os.path.isdir(self.path)
+
+
+def iter_dir(path):
+    '''Iterates over the entries of directory path. Each entry has the
+       path and name attributes and the is_dir method.
+    '''
+
+    if scandir is not None:
+        return scandir(path)
+
+    return (_Entry(path, name) for name in os.listdir(path))
+
+
+class IgnoreRules(object):
+    '''IgnoreRules matches paths against a list of patterns written in the
+       syntax of .gitignore. Patterns are relative to base_dir.
+    '''
+
+    def __init__(self, base_dir, patterns=[]):
+        super(IgnoreRules, self).__init__()
+        self.base_dir = base_dir
+        self.rules = []
+        for pattern in patterns:
+            self.add_pattern(pattern)
+
+    def add_pattern(self, pattern):
+        '''To add pattern to the rules. Comments and empty patterns are
+           ignored.
+        '''
+
+        pattern = pattern.strip()
+        if not pattern or pattern[0] == '#':
+            return
+
+        negate = pattern[0] == '!'
+        if negate:
+            pattern = pattern[1:]
+
+        dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+
+        # A pattern containing a '/' is matched against the path relative
+        # to base_dir, otherwise against the name only
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        if not pattern:
+            return
+
+        regex = fnmatch.translate(pattern)
+        if anchored:
+            regex = regex.replace('.*', '[^/]*').replace('[^/]*[^/]*', '.*')
+
+        self.rules.append((re.compile(regex), negate, dir_only, anchored))
+
+    def add_file(self, path):
+        '''To add the patterns of the file at path.
+        '''
+
+        try:
+            f = open(path, 'r')
+            patterns = f.read().splitlines()
+            f.close()
+        except IOError:
+            return
+
+        for pattern in patterns:
+            self.add_pattern(pattern)
+
+    def match(self, path, is_dir):
+        '''Returns True if path is ignored by the rules.
+        '''
+
+        rel_path = os.path.relpath(path, self.base_dir).replace(os.sep, '/')
+        name = os.path.basename(path)
+        ignored = False
+        for regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+
+            if regex.match(rel_path if anchored else name):
+                ignored = not negate
+
+        return ignored
+
+
+def walk_project(proj_dir, excludes=[], extensions=['.py', '.spec'],
+                 get_recorded_dir=None):
+    '''Iterates over the directories of proj_dir which are not ignored,
+       yielding a (path, mtime, dirs, files) tuple for each of them, where
+       dirs is the list of paths of its sub-directories and files the list
+       of paths of its files having one of extensions. Directories are
+       visited breadth first, starting from proj_dir.
+
+       excludes is a list of patterns, in the syntax of .gitignore, of
+       paths which are not walked in addition to :data:`DEFAULT_EXCLUDES`
+       and to the patterns of proj_dir's .gitignore.
+
+       If get_recorded_dir is given then it is called with the path and the
+       mtime of each directory and it can return a dict with the previously
+       found 'dirs' and 'files' of the directory if it hasn't changed
+       since.
+    '''
+
+    rules = IgnoreRules(proj_dir, DEFAULT_EXCLUDES + list(excludes))
+    rules.add_file(os.path.join(proj_dir, '.gitignore'))
+
+    to_walk = deque([proj_dir])
+    while to_walk:
+        path = to_walk.popleft()
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+
+        recorded = None
+        if get_recorded_dir:
+            recorded = get_recorded_dir(path, mtime)
+
+        if recorded:
+            dirs = list(recorded['dirs'])
+            files = list(recorded['files'])
+
+        else:
+            try:
+                entries = list(iter_dir(path))
+            except OSError:
+                continue
+
+            names = [entry.name for entry in entries]
+            if path != proj_dir and \
+                    any(marker in names for marker in VENV_MARKERS):
+                continue
+
+            dirs = []
+            files = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+
+                if rules.match(entry.path, is_dir):
+                    continue
+
+                if is_dir:
+                    dirs.append(entry.path)
+                elif os.path.splitext(entry.name)[1] in extensions:
+                    files.append(entry.path)
+
+            dirs.sort()
+            files.sort()
+
+        yield path, mtime, dirs, files
+
+        to_walk.extend(dirs)
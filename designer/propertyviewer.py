@@ -1,7 +1,11 @@
+from weakref import WeakKeyDictionary
+
 from kivy.uix.scrollview import ScrollView
+from kivy.uix.widget import Widget
 from kivy.properties import ObjectProperty, NumericProperty, StringProperty,\
     BoundedNumericProperty, BooleanProperty, OptionProperty
 from kivy.uix.label import Label
+from kivy.clock import Clock
 from kivy.uix.textinput import TextInput
 from kivy.uix.checkbox import CheckBox
 from kivy.uix.spinner import Spinner
@@ -66,12 +70,33 @@ class PropertyBase(object):
        :data:`kv_code_input` is a :class:`~kivy.properties.ObjectProperty`
     '''
 
+    _rebinding = False
+
+    def bind_to(self, propwidget, propname, record_to_undo=False):
+        '''To show the property propname of propwidget. It is used to reuse
+           this widget for another property, the value shown is changed
+           without being set back to the property.
+        '''
+
+        self._rebinding = True
+        try:
+            self.propwidget = propwidget
+            self.propname = propname
+        finally:
+            self._rebinding = False
+
+        self.have_error = False
+        self.record_to_undo = record_to_undo
+
     def set_value(self, value):
         '''This function first converts the value of the propwidget, then sets
            the new value. If there is some error in setting new value, then it
            sets the property value back to oldvalue
         '''
 
+        if self._rebinding:
+            return
+
         self.have_error = False
         conversion_err = False
         oldvalue = getattr(self.propwidget, self.propname)
@@ -91,12 +116,18 @@ class PropertyBase(object):
         if not conversion_err:
             try:
                 setattr(self.propwidget, self.propname, value)
-                self.kv_code_input.set_property_value(self.propwidget,
-                                                      self.propname, value,
-                                                      self.proptype)
-                if self.record_to_undo:
+                with self.kv_code_input.transaction() as transaction:
+                    self.kv_code_input.set_property_value(self.propwidget,
+                                                          self.propname,
+                                                          value,
+                                                          self.proptype)
+                if self.record_to_undo and transaction.delta:
                     root.undo_manager.push_operation(
-                        PropOperation(self, oldvalue, value))
+                        PropOperation(
+                            self.propname, self.kv_code_input,
+                            transaction.delta,
+                            self.kv_code_input.get_widget_path(
+                                self.propwidget)))
                 self.record_to_undo = True
             except Exception:
                 self.have_error = True
@@ -168,9 +199,24 @@ class PropertyViewer(ScrollView):
        :data:`kv_code_input` is a :class:`~kivy.properties.ObjectProperty`
     '''
 
+    project_loader = ObjectProperty(None)
+    '''Reference to ProjectLoader, used to know when the classes of the
+       project are reloaded.
+       :data:`project_loader` is a :class:`~kivy.properties.ObjectProperty`
+    '''
+
     def __init__(self, **kwargs):
         super(PropertyViewer, self).__init__(**kwargs)
         self._label_cache = {}
+        self._schema_cache = WeakKeyDictionary()
+        self._schema_version = None
+        self._editor_pool = {}
+        self._rows = None
+        self._shown = {}
+        self._shown_range = (0, 0)
+        self._update_rows_trigger = Clock.create_trigger(self._update_rows)
+        self.bind(scroll_y=self._update_rows_trigger,
+                  height=self._update_rows_trigger)
 
     def on_widget(self, instance, value):
         '''Default handler for 'on_widget'.
@@ -180,8 +226,15 @@ class PropertyViewer(ScrollView):
             self.discover(value)
 
     def clear(self):
-        '''To clear :data:`prop_list`.
+        '''To clear :data:`prop_list`. Editors of the properties are kept
+           to be reused for the next widget.
         '''
+        for label, editor in self._shown.values():
+            self._release_editor(editor)
+
+        self._shown = {}
+        self._shown_range = (0, 0)
+        self._rows = None
         self.prop_list.clear_widgets()
 
     def discover(self, value):
@@ -189,19 +242,104 @@ class PropertyViewer(ScrollView):
            :class:`~designer.propertyviewer.PropertyLabel` and
            :class:`~designer.propertyviewer.PropertyBoolean`/
            :class:`~designer.propertyviewer.PropertyTextInput`
-           to :data:`prop_list`.
+           to :data:`prop_list`. Only the rows which are visible are
+           added, the others are added when they are scrolled to.
+        '''
+
+        self._rows = self._get_schema(value)
+        self.scroll_y = 1
+        self._update_rows()
+
+    def _get_schema(self, widget):
+        '''Returns the list of the editable properties of widget, sorted
+           by name, as (name, editor kind, options) tuples. It depends only
+           on the class of widget, so it is built once per class, until
+           the classes of the project are reloaded.
+        '''
+
+        version = None
+        if self.project_loader:
+            version = self.project_loader.classes_version
+
+        if version != self._schema_version:
+            self._schema_cache.clear()
+            self._schema_version = version
+
+        cls = type(widget)
+        schema = self._schema_cache.get(cls)
+        if schema is None:
+            props = widget.properties().keys()
+            props.sort()
+            schema = []
+            for prop in props:
+                kind = self._get_editor_kind(prop)
+                if kind is None:
+                    continue
+
+                options = None
+                if kind == 'OptionProperty':
+                    options = list(widget.property(prop).options)
+
+                schema.append((prop, kind, options))
+
+            self._schema_cache[cls] = schema
+
+        return schema
+
+    def _get_visible_range(self):
+        '''Returns the range of the indexes of the rows which are visible.
         '''
 
-        add = self.prop_list.add_widget
-        get_label = self._get_label
-        props = value.properties().keys()
-        props.sort()
-        for prop in props:
-            ip = self.build_for(prop)
-            if not ip:
-                continue
-            add(get_label(prop))
-            add(ip)
+        row_height = self.prop_list.row_default_height
+        total = len(self._rows)
+        content_height = total * row_height + 2 * self.prop_list.padding[1]
+        hidden = max(content_height - self.height, 0)
+        top = (1 - self.scroll_y) * hidden
+        first = max(int(top // row_height) - 1, 0)
+        last = min(first + int(self.height // row_height) + 3, total)
+        return first, last
+
+    def _update_rows(self, *args):
+        '''To add the rows which have become visible to :data:`prop_list`,
+           reusing the editors of the rows which are no longer visible.
+           Hidden rows are replaced by spacers, so that :data:`prop_list`
+           has the height of all the rows.
+        '''
+
+        if self._rows is None:
+            return
+
+        first, last = self._get_visible_range()
+        if (first, last) == self._shown_range and self.prop_list.children:
+            return
+
+        for index in list(self._shown.keys()):
+            if not first <= index < last:
+                self._release_editor(self._shown.pop(index)[1])
+
+        for index in range(first, last):
+            if index not in self._shown:
+                prop, kind, options = self._rows[index]
+                self._shown[index] = (self._get_label(prop),
+                                      self._get_editor(prop, kind, options))
+
+        self._shown_range = (first, last)
+        prop_list = self.prop_list
+        prop_list.clear_widgets()
+        row_height = prop_list.row_default_height
+        self._add_spacer(first * row_height)
+        for index in range(first, last):
+            label, editor = self._shown[index]
+            prop_list.add_widget(label)
+            prop_list.add_widget(editor)
+
+        self._add_spacer((len(self._rows) - last) * row_height)
+
+    def _add_spacer(self, height):
+        if height > 0:
+            for i in range(self.prop_list.cols):
+                self.prop_list.add_widget(Widget(size_hint_y=None,
+                                                 height=height))
 
     def _get_label(self, prop):
         try:
@@ -210,34 +348,87 @@ class PropertyViewer(ScrollView):
             lbl = self._label_cache[prop] = PropertyLabel(text=prop)
             return lbl
 
-    def build_for(self, name):
-        '''To create :class:`~designer.propertyviewer.PropertyBoolean`
-           :class:`~designer.propertyviewer.PropertyTextInput`
-           for Property 'name'
+    def _get_editor(self, name, kind, options=None):
+        '''Returns an editor of kind for the property name of
+           :data:`widget`, reusing a pooled one if there is any. options
+           are the options of an OptionProperty.
+        '''
+
+        pool = self._editor_pool.get(kind)
+        if not pool:
+            return self._create_editor(name, kind)
+
+        editor = pool.pop()
+        if kind == 'OptionProperty':
+            editor.values = options
+
+        editor.bind_to(self.widget, name,
+                       record_to_undo=kind == 'BooleanProperty')
+        return editor
+
+    def _release_editor(self, editor):
+        '''To put editor back in the pool, so that it is reused.
+        '''
+
+        if isinstance(editor, TextInput):
+            editor.focus = False
+
+        if isinstance(editor, PropertyOptions):
+            kind = 'OptionProperty'
+        elif isinstance(editor, PropertyBoolean):
+            kind = 'BooleanProperty'
+        else:
+            kind = editor.proptype
+
+        self._editor_pool.setdefault(kind, []).append(editor)
+
+    def _get_editor_kind(self, name):
+        '''Returns the kind of editor used for the property name of
+           :data:`widget`, the name of the class of the property, None if
+           the property cannot be edited.
         '''
 
         prop = self.widget.property(name)
         if isinstance(prop, NumericProperty):
-            return PropertyTextInput(propwidget=self.widget, propname=name,
-                                     proptype='NumericProperty',
-                                     kv_code_input=self.kv_code_input)
+            return 'NumericProperty'
 
         elif isinstance(prop, StringProperty):
-            return PropertyTextInput(propwidget=self.widget, propname=name,
-                                     proptype='StringProperty',
-                                     kv_code_input=self.kv_code_input)
+            return 'StringProperty'
 
         elif isinstance(prop, BooleanProperty):
+            return 'BooleanProperty'
+
+        elif isinstance(prop, OptionProperty):
+            return 'OptionProperty'
+
+        return None
+
+    def _create_editor(self, name, kind):
+        if kind == 'BooleanProperty':
             ip = PropertyBoolean(propwidget=self.widget, propname=name,
                                  proptype='BooleanProperty',
                                  kv_code_input=self.kv_code_input)
             ip.record_to_undo = True
             return ip
 
-        elif isinstance(prop, OptionProperty):
-            ip = PropertyOptions(prop, propwidget=self.widget, propname=name,
-                                 proptype='StringProperty',
+        elif kind == 'OptionProperty':
+            return PropertyOptions(self.widget.property(name),
+                                   propwidget=self.widget, propname=name,
+                                   proptype='StringProperty',
+                                   kv_code_input=self.kv_code_input)
+
+        return PropertyTextInput(propwidget=self.widget, propname=name,
+                                 proptype=kind,
                                  kv_code_input=self.kv_code_input)
-            return ip
 
-        return None
+    def build_for(self, name):
+        '''To create :class:`~designer.propertyviewer.PropertyBoolean`
+           :class:`~designer.propertyviewer.PropertyTextInput`
+           for Property 'name'
+        '''
+
+        kind = self._get_editor_kind(name)
+        if kind is None:
+            return None
+
+        return self._create_editor(name, kind)
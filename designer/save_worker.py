@@ -0,0 +1,74 @@
+'''This module contains SaveWorker, the thread on which ProjectLoader
+   writes files, so that saving and auto saving never block the UI.
+'''
+
+import sys
+import threading
+
+from Queue import Queue
+from functools import partial
+
+from kivy.clock import Clock
+
+
+class SaveWorker(object):
+    '''SaveWorker runs the submitted tasks one after the other on a daemon
+       thread. Completion and failure callbacks are called on the main
+       thread, in the next frame after the task has finished.
+    '''
+
+    def __init__(self):
+        super(SaveWorker, self).__init__()
+        self._queue = Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run,
+                                                name='SaveWorker')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def submit(self, task, on_success=None, on_failure=None):
+        '''To run task on the worker thread. on_success is called with the
+           value returned by task and on_failure with the exception raised
+           by it.
+        '''
+
+        self._queue.put((task, on_success, on_failure))
+        self._start()
+
+    def is_busy(self):
+        '''Returns True if some submitted task hasn't finished.
+        '''
+
+        return self._queue.unfinished_tasks > 0
+
+    def wait(self):
+        '''To block until all the submitted tasks have finished.
+        '''
+
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            task, on_success, on_failure = self._queue.get()
+            try:
+                result = task()
+            except Exception as e:
+                if on_failure:
+                    Clock.schedule_once(partial(self._dispatch,
+                                                on_failure, e))
+                else:
+                    sys.stderr.write('SaveWorker: %s\n' % e)
+            else:
+                if on_success:
+                    Clock.schedule_once(partial(self._dispatch,
+                                                on_success, result))
+            finally:
+                self._queue.task_done()
+
+    def _dispatch(self, callback, value, *args):
+        callback(value)
@@ -63,6 +63,13 @@ class Toolbox(BoxLayout):
        :class:`~kivy.properties.ObjectProperty`
     '''
 
+    project_loader = ObjectProperty()
+    '''Reference to :class:`~designer.project_loader.ProjectLoader`, whose
+       widget_classifier gives the custom widgets.
+       :data:`project_loader` is an
+       :class:`~kivy.properties.ObjectProperty`
+    '''
+
     def __init__(self, **kwargs):
         super(Toolbox, self).__init__(**kwargs)
         Clock.schedule_once(self.discover_widgets, 0)
@@ -120,15 +127,10 @@ class Toolbox(BoxLayout):
 
         self.accordion.add_widget(self.custom_category)
 
-        custom_widgets = []
-        for widget in widgets:
-            if widget[1] == 'custom':
-                custom_widgets.append(widget)
-
-        custom_widgets.sort()
-        for widget in custom_widgets:
+        classifier = self.project_loader.widget_classifier
+        for name in classifier.get_names('custom'):
             self.custom_category.gridlayout.add_widget(
-                ToolboxButton(text=widget[0]))
+                ToolboxButton(text=name))
 
         # Setting appropriate height to gridlayout to enable scrolling
         self.custom_category.gridlayout.size_hint_y = None
@@ -1,3 +1,5 @@
+from weakref import WeakKeyDictionary, ref
+
 from kivy.uix.widget import Widget
 
 
@@ -17,7 +19,20 @@ class TreeNode(object):
         self.class_name = ''
         self.base_class_name = ''
         self.is_subclassed = False
-        self.widget = None
+        self._widget = None
+
+    def _get_widget(self):
+        if self._widget is None:
+            return None
+
+        return self._widget()
+
+    def _set_widget(self, widget):
+        # Widget is referenced weakly, so that Tree doesn't keep alive the
+        # widgets it indexes
+        self._widget = ref(widget) if widget is not None else None
+
+    widget = property(_get_widget, _set_widget)
 
 
 class Tree(object):
@@ -28,27 +43,32 @@ class Tree(object):
         super(Tree, self).__init__()
 
         self.list_root_nodes = []
+        self._nodes = WeakKeyDictionary()
 
     def insert(self, widget, parent=None):
         '''inserts a new node of widget with parent.
-           Returns new node on success
+           Returns new node on success. If widget is already in the tree
+           then its node, with its children, is moved to parent.
         '''
 
         if not isinstance(widget, Widget):
             TreeException('Tree accepts only Widget to be inserted')
 
-        if parent is None:
+        if parent is not None and not isinstance(parent, Widget):
+            TreeException('Tree only accepts parent to be a Widget')
+
+        node = self._nodes.get(widget)
+        if node is not None:
+            self._detach(node)
+        else:
             node = TreeNode()
             node.widget = widget
-            self.list_root_nodes.append(node)
-            return node
+            self._nodes[widget] = node
 
-        if not isinstance(parent, Widget):
-            TreeException('Tree only accepts parent to be a Widget')
+        parent_node = None
+        if parent is not None:
+            parent_node = self.get_node_for_widget(parent)
 
-        parent_node = self.get_node_for_widget(parent)
-        node = TreeNode()
-        node.widget = widget
         node.parent_node = parent_node
         if parent_node is None:
             self.list_root_nodes.append(node)
@@ -56,37 +76,31 @@ class Tree(object):
             parent_node.list_children.append(node)
         return node
 
-    def _get_node_for_widget(self, widget, node):
-        if node.widget == widget:
-            return node
-
-        for _node in node.list_children:
-            node_found = self._get_node_for_widget(widget, _node)
-            if node_found is not None:
-                return node_found
-
-        return None
-
     def get_node_for_widget(self, widget):
         '''Returns node for widget, None if not found
         '''
-        for _root in self.list_root_nodes:
-            node = self._get_node_for_widget(widget, _root)
-            if node is not None:
-                return node
-
-        return None
+        return self._nodes.get(widget)
 
     def traverse_tree(self, node=None):
-        '''Traverse the tree, and run traverse code for every node
+        '''Iterates over the nodes of the tree, depth first, starting
+           from node or from every root node if node is None.
         '''
         if node is None:
-            for _node in self.list_root_nodes:
-                self.traverse_tree(_node)
+            stack = list(reversed(self.list_root_nodes))
+        else:
+            stack = [node]
+
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.list_children))
+
+    def _detach(self, node):
+        if node.parent_node is None:
+            self.list_root_nodes.remove(node)
         else:
-            # Add traverse code here
-            for child in node.list_children:
-                self.traverse_tree(child)
+            node.parent_node.list_children.remove(node)
+        node.parent_node = None
 
     def delete(self, widget):
         '''deletes a node of widget from the Tree.
@@ -96,8 +110,12 @@ class Tree(object):
             TreeException('Tree accepts only Widget to be deleted')
 
         node = self.get_node_for_widget(widget)
-        if node in self.list_root_nodes:
-            self.list_root_nodes.remove(node)
-        else:
-            node.parent_node.list_children.remove(node)
+        if node is None:
+            return None
+
+        self._detach(node)
+        for _node in self.traverse_tree(node):
+            _widget = _node.widget
+            if _widget is not None:
+                self._nodes.pop(_widget, None)
         return node
@@ -12,10 +12,48 @@ from kivy.uix.screenmanager import ScreenManager
 from kivy.uix.tabbedpanel import TabbedPanelContent, \
     TabbedPanel, TabbedPanelHeader
 
-from designer.helper_functions import get_indent_str, get_line_end_pos,\
-    get_line_start_pos, get_indent_level, get_indentation
+from designer.helper_functions import get_indent_str, get_indent_level,\
+    get_indentation
+from designer.line_index import LineIndex
+from designer.kv_cache import get_content_hash
+from designer.kv_parser import parse_kv, find_rule, get_node_text,\
+    get_changed_nodes
 from designer.uix.designer_code_input import DesignerCodeInput
 
+ID_RE = re.compile(r'^\s*id\s*:\s*(\w+)', re.MULTILINE)
+'''Regular expression matching the ids declared in kv text.
+'''
+
+
+class KVTransaction(object):
+    '''KVTransaction collects the changes made by
+       :class:`~designer.uix.kv_lang_area.KVLangArea` to its text and
+       applies them as a single change when it ends, so that the text is
+       lexed and reloaded once. Transactions can be nested, changes are
+       applied when the outermost one ends. It is used as a context
+       manager::
+
+           with kv_lang_area.transaction():
+               kv_lang_area.set_property_value(widget, 'x', '10', '')
+               kv_lang_area.set_property_value(widget, 'y', '10', '')
+
+       Once it has ended, :data:`delta` is the applied change as a tuple of
+       its offset, the removed text and the inserted text, None if the
+       text hasn't been changed.
+    '''
+
+    def __init__(self, kv_lang_area):
+        super(KVTransaction, self).__init__()
+        self.kv_lang_area = kv_lang_area
+        self.delta = None
+
+    def __enter__(self):
+        self.kv_lang_area._begin_transaction()
+        return self
+
+    def __exit__(self, *args):
+        self.delta = self.kv_lang_area._end_transaction()
+
 
 class KVLangArea(DesignerCodeInput):
     '''KVLangArea is the CodeInput for editing kv lang. It emits on_show_edit
@@ -35,6 +73,13 @@ class KVLangArea(DesignerCodeInput):
 
     reload_kv = BooleanProperty(True)
 
+    incremental_reload = BooleanProperty(True)
+    '''Specifies whether only the widgets whose rules have been changed are
+       reloaded, instead of reloading the whole root widget.
+       :data:`incremental_reload` is a
+       :class:`~kivy.properties.BooleanProperty`
+    '''
+
     playground = ObjectProperty()
     '''Reference to :class:`~designer.playground.Playground`
        :data:`playground` is a :class:`~kivy.properties.ObjectProperty`
@@ -50,6 +95,93 @@ class KVLangArea(DesignerCodeInput):
         super(KVLangArea, self).__init__(**kwargs)
         self._reload_trigger = Clock.create_trigger(self.func_reload_kv, 1)
         self.bind(text=self._reload_trigger)
+        self._kv_rules = None
+        self._kv_lines = []
+        self._line_index = LineIndex()
+        self._transaction_depth = 0
+        self._transaction_text = None
+        self._transaction_span = None
+
+    def transaction(self):
+        '''Returns a new :class:`~designer.uix.kv_lang_area.KVTransaction`
+           to group the next changes made to the text.
+        '''
+
+        return KVTransaction(self)
+
+    def _begin_transaction(self):
+        if self._transaction_depth == 0:
+            self._transaction_text = self._get_line_index().text
+            self._transaction_span = None
+
+        self._transaction_depth += 1
+
+    def _end_transaction(self):
+        '''To end a transaction. If it is the outermost one then changes
+           are applied to the text and returned as a tuple of their offset,
+           the removed text and the inserted text.
+        '''
+
+        self._transaction_depth -= 1
+        if self._transaction_depth > 0 or self._transaction_span is None:
+            return None
+
+        old_text = self._transaction_text
+        new_text = self._line_index.text
+        start, tail = self._transaction_span
+        self._transaction_text = None
+        self._transaction_span = None
+        self.text = new_text
+        return (start, old_text[start:len(old_text) - tail],
+                new_text[start:len(new_text) - tail])
+
+    def _get_line_index(self):
+        '''Returns the :class:`~designer.line_index.LineIndex` of the text,
+           updated for the changes made to the text since it was last used.
+           During a transaction, it indexes the text with the changes of the
+           transaction.
+        '''
+
+        if self._transaction_depth == 0:
+            self._line_index.update(self.text)
+
+        return self._line_index
+
+    def _splice(self, start, end, s):
+        '''To replace the text between start and end with s. The line index
+           is updated without comparing the old and new texts. During a
+           transaction the text itself is changed when it ends.
+        '''
+
+        line_index = self._get_line_index()
+        text_len = len(line_index.text)
+        start, end, _ = slice(start, end).indices(text_len)
+        end = max(start, end)
+        line_index.splice(start, end, s)
+        if self._transaction_depth == 0:
+            self.text = line_index.text
+            return
+
+        # Span of the text changed by the transaction, as its offset and
+        # the length of the unchanged text after it
+        span = self._transaction_span or (start, text_len - end)
+        self._transaction_span = (min(span[0], start),
+                                  min(span[1], text_len - end))
+
+    def _insert_at(self, lineno, col, s):
+        '''To insert s at column col of line lineno.
+        '''
+
+        pos = self._get_line_index().get_line_offset(lineno) + col
+        self._splice(pos, pos, s)
+
+    def _set_cursor(self, cursor):
+        '''To move the cursor, unless a transaction is in progress as the
+           text is not up to date yet.
+        '''
+
+        if self._transaction_depth == 0:
+            self.cursor = cursor
 
     def _get_widget_path(self, widget):
         '''To get path of a widget, path of a widget is a list containing
@@ -119,6 +251,16 @@ class KVLangArea(DesignerCodeInput):
 
         return path_to_widget
 
+    def get_widget_path(self, widget):
+        '''Returns the path of widget, see :meth:`_get_widget_path`, from
+           the root widget as a tuple, None if there is no root widget.
+        '''
+
+        if not self.playground.root:
+            return None
+
+        return tuple(reversed(self._get_widget_path(widget)))
+
     def shift_widget(self, widget, from_index):
         '''This function will shift widget's kv str from one position
            to another.
@@ -132,41 +274,44 @@ class KVLangArea(DesignerCodeInput):
         start_pos, end_pos = self.get_widget_text_pos_from_kv(
             widget, widget.parent, path_to_widget=prev_path)
 
-        widget_text = self.text[start_pos:end_pos]
+        widget_text = self._get_line_index().text[start_pos:end_pos]
 
+        with self.transaction():
+            self._shift_widget_text(widget, path, widget_text, start_pos,
+                                    end_pos)
+
+    def _shift_widget_text(self, widget, path, widget_text, start_pos,
+                           end_pos):
+        self._splice(start_pos, end_pos, '')
         if widget.parent.children.index(widget) == 0:
-            self.text = self.text[:start_pos] + self.text[end_pos:]
             self.add_widget_to_parent(widget, widget.parent,
                                       kv_str=widget_text)
 
         else:
-            self.text = self.text[:start_pos] + self.text[end_pos:]
-            text = re.sub(r'#.+', '', self.text)
-            lines = text.splitlines()
+            line_index = self._get_line_index()
+            lines = line_index.get_lines()
             total_lines = len(lines)
-            root_lineno = 0
-            root_name = self.project_loader.root_rule.name
-            for lineno, line in enumerate(lines):
-                pos = line.find(root_name)
-                if pos != -1 and get_indentation(line) == 0:
-                    root_lineno = lineno
-                    break
+            root_lineno = line_index.get_root_lineno(
+                self.project_loader.root_rule.name)
 
             next_widget_path = path
             lineno = self._find_widget_place(next_widget_path, lines,
                                              total_lines,
                                              root_lineno + 1)
 
-            self.cursor = (0, lineno)
-            self.insert_text(widget_text + '\n')
+            self._insert_at(lineno, 0, widget_text + '\n')
 
     def add_widget_to_parent(self, widget, target, kv_str=''):
         '''This function is called when widget is added to target.
            It will search for line where parent is defined in text and will add
            widget there.
         '''
-        text = re.sub(r'#.+', '', self.text)
-        lines = text.splitlines()
+        with self.transaction():
+            self._add_widget_text(widget, target, kv_str)
+
+    def _add_widget_text(self, widget, target, kv_str):
+        line_index = self._get_line_index()
+        lines = line_index.get_lines()
         total_lines = len(lines)
         if total_lines == 0:
             return
@@ -179,17 +324,8 @@ class KVLangArea(DesignerCodeInput):
 
             path_to_widget.reverse()
 
-            root_lineno = 0
-            root_name = self.project_loader.root_rule.name
-            for lineno, line in enumerate(lines):
-                pos = line.find(root_name)
-                if pos != -1 and get_indentation(line) == 0:
-                    root_lineno = lineno
-                    break
-
-            parent_lineno = self._find_widget_place(path_to_widget, lines,
-                                                    total_lines,
-                                                    root_lineno + 1)
+            parent_lineno = self._find_widget_lineno(target, path_to_widget,
+                                                     line_index, lines)
 
             if parent_lineno >= total_lines:
                 return
@@ -205,15 +341,8 @@ class KVLangArea(DesignerCodeInput):
                 # If parent_line doesn't contain ':' then insert it
                 # Also insert widget's rule after its properties
                 insert_after_line = parent_lineno
-                _line = 0
-                _line_pos = -1
-                _line_pos = self.text.find('\n', _line_pos + 1)
-
-                while _line <= insert_after_line:
-                    _line_pos = self.text.find('\n', _line_pos + 1)
-                    _line += 1
-
-                self.text = self.text[:_line_pos] + ':' + self.text[_line_pos:]
+                _line_pos = line_index.get_line_end_pos(insert_after_line + 1)
+                self._splice(_line_pos, _line_pos, ':')
                 indent = len(parent_line) - len(parent_line.lstrip())
 
             else:
@@ -244,37 +373,24 @@ class KVLangArea(DesignerCodeInput):
 
             if insert_after_line == total_lines - 1:
                 # if inserting at the last line
-                _line_pos = len(self.text) - 1
+                _line_pos = len(line_index.text) - 1
 
-                self.text = self.text[:_line_pos + 1] + '\n' + \
-                    get_indent_str(indent + 4) + to_insert
+                self._splice(_line_pos + 1, len(line_index.text), '\n' +
+                             get_indent_str(indent + 4) + to_insert)
             else:
                 # inserting somewhere else
                 insert_after_line -= 1
-                _line = 0
-                _line_pos = -1
-                _line_pos = self.text.find('\n', _line_pos + 1)
-                while _line <= insert_after_line:
-                    _line_pos = self.text.find('\n', _line_pos + 1)
-                    _line += 1
-
-                self.text = self.text[:_line_pos] + '\n' + \
-                    get_indent_str(indent + 4) + to_insert + \
-                    self.text[_line_pos:]
+                _line_pos = line_index.get_line_end_pos(insert_after_line + 1)
+                self._splice(_line_pos, _line_pos, '\n' +
+                             get_indent_str(indent + 4) + to_insert)
 
         else:
             # widget is a root widget
             parent_lineno = 0
-            self.cursor = (0, 0)
             type_name = type(widget).__name__
-            is_class = False
-            for rule in self.project_loader.class_rules:
-                if rule.name == type_name:
-                    is_class = True
-                    break
-
-            if not is_class:
-                self.insert_text(type_name + ':\n')
+            if not self.project_loader.widget_classifier.has_rule(type_name):
+                self._insert_at(0, 0, type_name + ':\n')
+                self._set_cursor((0, 1))
 
             self.project_loader.set_root_widget(type_name, widget)
 
@@ -288,19 +404,11 @@ class KVLangArea(DesignerCodeInput):
 
         # Go to widget's rule's line and determines all its rule's
         # and it's child if any. Then delete them
-        text = re.sub(r'#.+', '', self.text)
-        lines = text.splitlines()
+        line_index = self._get_line_index()
+        lines = line_index.get_lines()
         total_lines = len(lines)
-        root_lineno = 0
-        root_name = self.project_loader.root_rule.name
-        for lineno, line in enumerate(lines):
-            pos = line.find(root_name)
-            if pos != -1 and get_indentation(line) == 0:
-                root_lineno = lineno
-                break
-
-        widget_lineno = self._find_widget_place(path_to_widget, lines,
-                                                total_lines, root_lineno + 1)
+        widget_lineno = self._find_widget_lineno(widget, path_to_widget,
+                                                 line_index, lines)
         widget_line = lines[widget_lineno]
         indent = len(widget_line) - len(widget_line.lstrip())
         lineno = widget_lineno
@@ -319,13 +427,13 @@ class KVLangArea(DesignerCodeInput):
             delete_until_line -= 1
             line = lines[delete_until_line]
 
-        widget_line_pos = get_line_start_pos(self.text, widget_lineno)
+        widget_line_pos = line_index.get_line_start_pos(widget_lineno)
         delete_until_line_pos = -1
         if delete_until_line == total_lines - 1:
-            delete_until_line_pos = len(self.text)
+            delete_until_line_pos = len(line_index.text)
         else:
-            delete_until_line_pos = get_line_end_pos(self.text,
-                                                     delete_until_line)
+            delete_until_line_pos = line_index.get_line_end_pos(
+                delete_until_line)
 
         self._reload = False
 
@@ -338,7 +446,7 @@ class KVLangArea(DesignerCodeInput):
 
         start_pos, end_pos = self.get_widget_text_pos_from_kv(
             widget, parent, path_to_widget=path)
-        text = self.text[start_pos:end_pos]
+        text = self._get_line_index().text[start_pos:end_pos]
 
         return text
 
@@ -346,7 +454,7 @@ class KVLangArea(DesignerCodeInput):
         '''This function is called when widget is removed from parent.
            It will delete widget's rule from parent's rule
         '''
-        if self.text == '':
+        if self._get_line_index().text == '':
             return
 
         self._reload = False
@@ -365,8 +473,8 @@ class KVLangArea(DesignerCodeInput):
         if delete_from_kv:
             start_pos, end_pos = self.get_widget_text_pos_from_kv(widget,
                                                                   parent)
-            text = self.text[start_pos:end_pos]
-            self.text = self.text[:start_pos] + self.text[end_pos:]
+            text = self._get_line_index().text[start_pos:end_pos]
+            self._splice(start_pos, end_pos, '')
             return text
 
     def _get_widget_from_path(self, path):
@@ -400,25 +508,46 @@ class KVLangArea(DesignerCodeInput):
             return
 
         if self.text == '':
+            self._kv_rules = None
             return
 
         if not self._reload:
             self._reload = True
+            # Text has been changed by Designer itself, Playground already
+            # contains these changes
+            self._kv_rules = parse_kv(self.text)
+            self._kv_lines = self.text.splitlines()
             return
 
+        self.reload_text()
+
+    def reload_text(self, full_reload=False):
+        '''To apply the text to the widgets of Playground, reloading only
+           the changed widgets if incremental_reload is True and
+           full_reload is False.
+        '''
+
         statusbar = self.statusbar
 
         playground = self.playground
         project_loader = self.project_loader
 
         try:
-            widget = project_loader.reload_from_str(self.text)
-
-            if widget:
-                playground.remove_widget_from_parent(playground.root,
-                                                     None, from_kv=True)
-                playground.add_widget_to_parent(widget, None, from_kv=True)
-
+            rules = parse_kv(self.text)
+            if full_reload or not self.incremental_reload or \
+                    not self._reload_changed_widgets(rules):
+                widget = project_loader.reload_from_str(self.text)
+
+                if widget:
+                    # Text has its own undo, widgets are not recorded
+                    playground.remove_widget_from_parent(playground.root,
+                                                         True, from_kv=True)
+                    playground.add_widget_to_parent(widget, None,
+                                                    from_undo=True,
+                                                    from_kv=True)
+
+            self._kv_rules = rules
+            self._kv_lines = self.text.splitlines()
             statusbar.show_message("")
             self.have_error = False
 
@@ -426,6 +555,169 @@ class KVLangArea(DesignerCodeInput):
             self.have_error = True
             statusbar.show_message("Cannot reload from text")
 
+    def apply_delta(self, offset, removed, inserted, text_hash=None):
+        '''To replace removed, found at offset in the text, with inserted
+           and reload the widgets whose rules have changed. It is used to
+           undo and redo the changes recorded by
+           :class:`~designer.undo_manager.KVOperation`. Returns False if
+           the text at offset isn't removed anymore or, if text_hash is
+           given, if the hash of the whole text isn't text_hash.
+        '''
+
+        text = self._get_line_index().text
+        end = offset + len(removed)
+        if text[offset:end] != removed or \
+                (text_hash is not None and
+                 get_content_hash(text) != text_hash):
+            if self.statusbar:
+                self.statusbar.show_message('Cannot apply change, kv text '
+                                            'has been modified')
+            return False
+
+        self._parse_pending(text)
+        self._splice(offset, end, inserted)
+        self.reload_text()
+        # Widgets are up to date, pending reload has only to parse the text
+        self._reload = False
+        return True
+
+    def load_text(self, text, full_reload=False):
+        '''To replace the whole text with text, e.g. read again from the kv
+           files changed outside Designer, and reload the widgets whose
+           rules have changed, or the whole root widget if full_reload is
+           True. The selected widget is selected again once reloaded.
+        '''
+
+        playground = self.playground
+        root = playground.root
+        selected = playground.selected_widget
+        path = None
+        if selected is not None and root is not None:
+            path = self._get_widget_path(selected)
+            path.reverse()
+
+        self._parse_pending(self._get_line_index().text)
+        self.text = text
+        self.reload_text(full_reload)
+        self._reload = False
+
+        if path is None or playground.root is root:
+            # Replaced widgets are selected again by Playground
+            return
+
+        widget = self._get_widget_from_path(path) or playground.root
+        playground.selected_widget = widget
+        App.get_running_app().focus_widget(widget)
+
+    def _parse_pending(self, text):
+        '''To parse text, the current text, if the last change made by
+           Designer hasn't been parsed yet. Rules of the last reloaded text
+           are needed to find the widgets changed by the next change.
+        '''
+
+        if not self._reload:
+            self._kv_rules = parse_kv(text)
+            self._kv_lines = text.splitlines()
+
+    def _reload_changed_widgets(self, rules):
+        '''To reload only the widgets whose rules differ between the last
+           reloaded text and rules, the newly parsed text. Returns False if
+           it cannot be done and whole root widget has to be reloaded, i.e.
+           when root rule's header or any class rule is changed, or when a
+           changed widget declares or uses an id.
+        '''
+
+        old_rules = self._kv_rules
+        if old_rules is None or not self.playground.root:
+            return False
+
+        root_name = self.project_loader.root_rule.name
+        old_root = find_rule(old_rules, root_name)
+        new_root = find_rule(rules, root_name)
+        if not old_root or not new_root or old_root.header != new_root.header:
+            return False
+
+        # Class rules are applied to every instance of class,
+        # so reload everything if any of them is changed
+        old_lines = self._kv_lines
+        new_lines = self.text.splitlines()
+        old_rules_str = [get_node_text(old_lines, rule) for rule in old_rules
+                         if rule is not old_root]
+        new_rules_str = [get_node_text(new_lines, rule) for rule in rules
+                         if rule is not new_root]
+        if old_rules_str != new_rules_str:
+            return False
+
+        # Ids are resolved by the rule, a widget reloaded on its own would
+        # neither see them nor be seen by them
+        ids = set(ID_RE.findall(get_node_text(old_lines, old_root)))
+        ids.update(ID_RE.findall(get_node_text(new_lines, new_root)))
+        ids_re = None
+        if ids:
+            ids_re = re.compile(r'\b(%s)\b' % '|'.join(sorted(ids)))
+
+        changed = get_changed_nodes(old_root, new_root)
+        to_replace = []
+        for node in changed:
+            if node is new_root:
+                return False
+
+            widget = self._get_widget_for_node(node)
+            if not widget:
+                return False
+
+            old_node = old_root
+            for index in node.get_path():
+                old_node = old_node.children[index]
+
+            widget_str = get_node_text(new_lines, node)
+            for text in (widget_str, get_node_text(old_lines, old_node)):
+                if re.search(r'\broot\.', text):
+                    # 'root' would refer to the reloaded widget
+                    return False
+
+                if ids_re and ids_re.search(text):
+                    return False
+
+            to_replace.append((widget, widget_str))
+
+        # Widgets are all built before any of them is replaced, so that
+        # a failure doesn't leave the tree partly reloaded
+        new_widgets = []
+        for widget, widget_str in to_replace:
+            new_widget = self.project_loader.load_widget_from_str(widget_str)
+            if not new_widget:
+                return False
+
+            new_widgets.append((widget, new_widget))
+
+        for widget, new_widget in new_widgets:
+            self.playground.replace_widget(widget, new_widget)
+
+        return True
+
+    def _get_widget_for_node(self, node):
+        '''To get the widget in Playground which has been created from
+           node of root rule, None if it cannot be found.
+        '''
+
+        widget = self.playground.root
+        for index in node.get_path():
+            if isinstance(widget, (Carousel, ScreenManager, TabbedPanel)):
+                # Their children are not the ones declared in kv
+                return None
+
+            children = widget.children
+            if index >= len(children):
+                return None
+
+            widget = children[len(children) - 1 - index]
+
+        if type(widget).__name__ != node.name:
+            return None
+
+        return widget
+
     def _get_widget_path_at_line(self, lineno, root_lineno=0):
         '''To get widget path of widget at line
         '''
@@ -433,11 +725,8 @@ class KVLangArea(DesignerCodeInput):
         if self.text == '':
             return []
 
-        text = self.text
-        # Remove all comments
-        text = re.sub(r'#.+', '', text)
-
-        lines = text.splitlines()
+        # Lines are indexed with their comments removed
+        lines = self._get_line_index().get_lines()
         line = lines[lineno]
 
         # Search for the line containing widget's name
@@ -486,93 +775,72 @@ class KVLangArea(DesignerCodeInput):
         return path
 
     def get_property_value(self, widget, prop):
+        '''Returns the value of prop, a property or an event handler,
+           declared in widget's rule, '' if it is not declared there.
+        '''
+
+        return self.get_rule_values(widget).get(prop, '')
+
+    def get_rule_values(self, widget):
+        '''Returns a dict of the properties and event handlers declared in
+           widget's rule with their values, stripped of the surrounding
+           whitespaces. The rule is read in a single pass.
+        '''
+
         self._reload = False
-        if prop[:3] != 'on_' and \
-                not isinstance(widget.properties()[prop], StringProperty) and\
-                value == '':
-            return
 
         path_to_widget = self._get_widget_path(widget)
         path_to_widget.reverse()
 
         # Go to the line where widget is declared
-        lines = re.sub(r'#.+', '', self.text).splitlines()
-        total_lines = len(lines)
-
-        root_name = self.project_loader.root_rule.name
+        line_index = self._get_line_index()
+        lines = line_index.get_lines()
         total_lines = len(lines)
-        root_lineno = 0
-        for lineno, line in enumerate(lines):
-            pos = line.find(root_name)
-            if pos != -1 and get_indentation(line) == 0:
-                root_lineno = lineno
-                break
+        if total_lines == 0:
+            return {}
 
-        widget_lineno = self._find_widget_place(path_to_widget, lines,
-                                                total_lines, root_lineno + 1)
-        widget_line = lines[widget_lineno]
-        indent = get_indentation(widget_line)
-        prop_found = False
+        widget_lineno = self._find_widget_lineno(widget, path_to_widget,
+                                                 line_index, lines)
+        indent = get_indentation(lines[widget_lineno])
 
-        # Else find if property has already been declared with a value
-        lineno = widget_lineno + 1
-        # But if widget line is the last line in the text
-        if lineno < total_lines:
+        values = {}
+        for lineno in range(widget_lineno + 1, total_lines):
             line = lines[lineno]
-            _indent = get_indentation(line)
-            colon_pos = -1
-            while lineno < total_lines and (line.strip() == '' or
-                                            _indent > indent):
-                line = lines[lineno]
-                _indent = get_indentation(line)
-                if line.strip() != '':
-                    colon_pos = line.find(':')
-                    if colon_pos == -1:
-                        break
-
-                    if colon_pos == len(line.rstrip()) - 1:
-                        break
-
-                    if prop == line[:colon_pos].strip():
-                        prop_found = True
-                        break
+            if line.strip() == '':
+                continue
 
-                lineno += 1
+            if get_indentation(line) <= indent:
+                break
 
-        if prop_found:
-            # if property found then change its value
-            _pos_prop_value = get_line_start_pos(self.text, lineno) + \
-                colon_pos + 2
-            if lineno == total_lines - 1:
-                _line_end_pos = len(self.text)
-            else:
-                _line_end_pos = get_line_end_pos(self.text, lineno)
+            colon_pos = line.find(':')
+            if colon_pos == -1 or colon_pos == len(line.rstrip()) - 1:
+                # Properties are declared before children
+                break
 
-            return self.text[_pos_prop_value:_line_end_pos]
+            name = line[:colon_pos].strip()
+            if name not in values:
+                # Value is read from the text, with its comment
+                values[name] = \
+                    line_index.get_line(lineno)[colon_pos + 1:].strip()
 
-        return ""
+        return values
 
     def set_event_handler(self, widget, prop, value):
+        with self.transaction():
+            self._set_event_handler_text(widget, prop, value)
+
+    def _set_event_handler_text(self, widget, prop, value):
         self._reload = False
 
         path_to_widget = self._get_widget_path(widget)
         path_to_widget.reverse()
 
         # Go to the line where widget is declared
-        lines = re.sub(r'#.+', '', self.text).splitlines()
-        total_lines = len(lines)
-
-        root_name = self.project_loader.root_rule.name
+        line_index = self._get_line_index()
+        lines = line_index.get_lines()
         total_lines = len(lines)
-        root_lineno = 0
-        for lineno, line in enumerate(lines):
-            pos = line.find(root_name)
-            if pos != -1 and get_indentation(line) == 0:
-                root_lineno = lineno
-                break
-
-        widget_lineno = self._find_widget_place(path_to_widget, lines,
-                                                total_lines, root_lineno + 1)
+        widget_lineno = self._find_widget_lineno(widget, path_to_widget,
+                                                 line_index, lines)
 
         widget_line = lines[widget_lineno]
         indent = get_indentation(widget_line)
@@ -583,9 +851,8 @@ class KVLangArea(DesignerCodeInput):
 
         if ':' not in widget_line:
             # If cannot find ':' then insert it
-            self.cursor = (len(lines[widget_lineno]), widget_lineno)
+            self._insert_at(widget_lineno, len(lines[widget_lineno]), ':')
             lines[widget_lineno] += ':'
-            self.insert_text(':')
 
         else:
             # Else find if property has already been declared with a value
@@ -615,40 +882,39 @@ class KVLangArea(DesignerCodeInput):
 
         if prop_found:
             if lineno == total_lines - 1:
-                _line_end_pos = len(self.text)
+                _line_end_pos = len(line_index.text)
             else:
-                _line_end_pos = get_line_end_pos(self.text, lineno)
+                _line_end_pos = line_index.get_line_end_pos(lineno)
 
             if value != '':
                 # if property found then change its value
-                _pos_prop_value = get_line_start_pos(self.text, lineno) + \
+                _pos_prop_value = line_index.get_line_start_pos(lineno) + \
                     colon_pos + 2
-                self.text = self.text[:_pos_prop_value] + ' ' + value + \
-                    self.text[_line_end_pos:]
+                self._splice(_pos_prop_value, _line_end_pos, ' ' + value)
 
-                self.cursor = (0, lineno)
+                self._set_cursor((0, lineno))
 
             else:
-                _line_start_pos = get_line_start_pos(self.text, widget_lineno)
-                self.text = \
-                    self.text[:get_line_start_pos(self.text, lineno)] + \
-                    self.text[_line_end_pos:]
+                self._splice(line_index.get_line_start_pos(lineno),
+                             _line_end_pos, '')
 
         elif value != '':
             # if not found then add property after the widgets line
-            _line_end_pos = get_line_end_pos(self.text, widget_lineno)
-
             indent_str = '\n'
             for i in range(indent + 4):
                 indent_str += ' '
 
-            self.cursor = (len(lines[widget_lineno]), widget_lineno)
-            self.insert_text(indent_str + prop + ': ' + str(value))
+            self._insert_at(widget_lineno, len(lines[widget_lineno]),
+                            indent_str + prop + ': ' + str(value))
 
     def set_property_value(self, widget, prop, value, proptype):
         '''To find and change the value of property of widget rule in text
         '''
 
+        with self.transaction():
+            self._set_property_text(widget, prop, value, proptype)
+
+    def _set_property_text(self, widget, prop, value, proptype):
         # Do not add property if value is empty and
         # property is not a string property
 
@@ -661,20 +927,11 @@ class KVLangArea(DesignerCodeInput):
         path_to_widget.reverse()
 
         # Go to the line where widget is declared
-        lines = re.sub(r'#.+', '', self.text.rstrip()).splitlines()
+        line_index = self._get_line_index()
+        lines = line_index.get_lines(rstrip=True)
         total_lines = len(lines)
-
-        root_name = self.project_loader.root_rule.name
-        total_lines = len(lines)
-        root_lineno = 0
-        for lineno, line in enumerate(lines):
-            pos = line.find(root_name)
-            if pos != -1 and get_indentation(line) == 0:
-                root_lineno = lineno
-                break
-
-        widget_lineno = self._find_widget_place(path_to_widget, lines,
-                                                total_lines, root_lineno + 1)
+        widget_lineno = self._find_widget_lineno(widget, path_to_widget,
+                                                 line_index, lines)
         widget_line = lines[widget_lineno]
         if not widget_line.strip():
             return
@@ -684,9 +941,8 @@ class KVLangArea(DesignerCodeInput):
 
         if ':' not in widget_line:
             # If cannot find ':' then insert it
-            self.cursor = (len(lines[widget_lineno]), widget_lineno)
+            self._insert_at(widget_lineno, len(lines[widget_lineno]), ':')
             lines[widget_lineno] += ':'
-            self.insert_text(':')
 
         else:
             # Else find if property has already been declared with a value
@@ -716,25 +972,22 @@ class KVLangArea(DesignerCodeInput):
 
         if prop_found:
             # if property found then change its value
-            _pos_prop_value = get_line_start_pos(self.text, lineno) + \
+            _pos_prop_value = line_index.get_line_start_pos(lineno) + \
                 colon_pos + 2
             if lineno == total_lines - 1:
-                _line_end_pos = len(self.text)
+                _line_end_pos = len(line_index.text)
             else:
-                _line_end_pos = get_line_end_pos(self.text, lineno)
+                _line_end_pos = line_index.get_line_end_pos(lineno)
 
             if proptype == 'StringProperty':
                 value = "'{}'".format(value.replace("'", "\\'"))
 
-            self.text = self.text[:_pos_prop_value] + ' ' + str(value) + \
-                self.text[_line_end_pos:]
+            self._splice(_pos_prop_value, _line_end_pos, ' ' + str(value))
 
-            self.cursor = (0, lineno)
+            self._set_cursor((0, lineno))
 
         else:
             # if not found then add property after the widgets line
-            _line_start_pos = get_line_start_pos(self.text, widget_lineno)
-            _line_end_pos = get_line_end_pos(self.text, widget_lineno)
             if proptype == 'StringProperty':
                 value = "'{}'".format(value.replace("'", "\\'"))
 
@@ -742,8 +995,31 @@ class KVLangArea(DesignerCodeInput):
             for i in range(indent + 4):
                 indent_str += ' '
 
-            self.cursor = (len(lines[widget_lineno]), widget_lineno)
-            self.insert_text(indent_str + prop + ': ' + str(value))
+            self._insert_at(widget_lineno, len(lines[widget_lineno]),
+                            indent_str + prop + ': ' + str(value))
+
+    def _find_widget_lineno(self, widget, path, line_index, lines):
+        '''To find the line where widget, whose path is path, is declared
+           in lines, the lines of line_index. The line is marked with widget
+           in line_index, so that it is not searched again while it and the
+           lines before it are unchanged.
+        '''
+
+        path = tuple(path)
+        name = type(widget).__name__
+        mark = line_index.get_mark(widget)
+        if mark is not None and mark[1] == path and mark[0] < len(lines) \
+                and name in lines[mark[0]]:
+            return mark[0]
+
+        root_lineno = line_index.get_root_lineno(
+            self.project_loader.root_rule.name)
+        lineno = self._find_widget_place(path, lines, len(lines),
+                                         root_lineno + 1)
+        if lineno < len(lines) and name in lines[lineno]:
+            line_index.set_mark(widget, lineno, path)
+
+        return lineno
 
     def _find_widget_place(self, path, lines, total_lines, lineno, indent=4):
         '''To find the line where widget is declared according to path
@@ -17,6 +17,18 @@ class PyCodeInput(DesignerCodeInput):
        :data:`rel_file_path` is a :class:`~kivy.properties.StringProperty`
     '''
 
+    saved_text = StringProperty('')
+    '''Text of the file when it was last opened or saved.
+       :data:`saved_text` is a :class:`~kivy.properties.StringProperty`
+    '''
+
+    def is_dirty(self):
+        '''Returns True if text has been modified since it was last opened
+           or saved.
+        '''
+
+        return self.text != self.saved_text
+
 
 class PyScrollView(ScrollView):
     '''PyScrollView used as a :class:`~kivy.scrollview.ScrollView`
@@ -1,8 +1,40 @@
+import sys
+import time
+
 from kivy.properties import ObjectProperty, OptionProperty
-from kivy.uix.textinput import TextInput
-from kivy.uix.checkbox import CheckBox
 from kivy.app import App
 
+from designer.kv_cache import get_content_hash
+
+OPERATION_SIZE = 512
+'''Estimated size, in bytes, of an operation without the values it keeps.
+'''
+
+
+def merge_deltas(first, second):
+    '''Returns the change of the text equivalent to the change first
+       followed by the change second, None if the parts of the text they
+       change are not contiguous. Changes are tuples of their offset, the
+       removed text and the inserted text.
+    '''
+
+    offset1, removed1, inserted1 = first
+    offset2, removed2, inserted2 = second
+    end1 = offset1 + len(inserted1)
+    end2 = offset2 + len(removed2)
+    if offset2 > end1 or end2 < offset1:
+        return None
+
+    # Text between start and max(end1, end2) once first has been applied
+    start = min(offset1, offset2)
+    text = removed2[:offset1 - start] + inserted1
+    if end2 > end1:
+        text += removed2[end1 - offset2:]
+
+    return (start,
+            text[:offset1 - start] + removed1 + text[end1 - start:],
+            text[:offset2 - start] + inserted2 + text[end2 - start:])
+
 
 class OperationBase(object):
     '''UndoOperationBase class, Abstract class for all Undo Operations
@@ -18,131 +50,210 @@ class OperationBase(object):
     def do_redo(self):
         pass
 
+    def get_size(self):
+        '''Returns the estimated size, in bytes, of the memory kept alive
+           by the operation.
+        '''
+        return OPERATION_SIZE
 
-class WidgetOperation(OperationBase):
-    '''WidgetOperation class for widget operations of add and remove
+    def merge(self, op):
+        '''To merge op, which has been done just after this operation, into
+           this operation. Returns False if they can't be merged.
+        '''
+        return False
+
+
+class KVOperation(OperationBase):
+    '''KVOperation is the base class of the operations recorded as the
+       change they made to the text of
+       :class:`~designer.uix.kv_lang_area.KVLangArea`, delta, a tuple of
+       its offset, the removed text and the inserted text. Widgets are not
+       kept, KVLangArea creates them again from the text when the change is
+       undone or redone.
+
+       It must be created just after the change has been made. The hashes
+       of the whole text before and after the change are kept, the change
+       is undone or redone only if the text is still the one it applies
+       to.
     '''
 
-    def __init__(self, widget_op_type, widget, parent, playground, kv_str):
-        super(WidgetOperation, self).__init__('widget')
-        self.widget_op_type = widget_op_type
-        self.parent = parent
-        self.widget = widget
-        self.playground = playground
-        self.kv_str = kv_str
+    def __init__(self, operation_type, kv_code_input, delta):
+        super(KVOperation, self).__init__(operation_type)
+        self.kv_code_input = kv_code_input
+        self.delta = delta
+        offset, removed, inserted = delta
+        text = kv_code_input.text
+        self.text_hashes = (
+            get_content_hash(text[:offset] + removed +
+                             text[offset + len(inserted):]),
+            get_content_hash(text))
 
     def do_undo(self):
         '''Override of :class:`OperationBase`.do_undo.
-           This will undo a WidgetOperation.
+           Returns False if the change cannot be undone anymore.
         '''
-        if self.widget_op_type == 'add':
-            self.playground.remove_widget_from_parent(self.widget, True)
-
-        else:
-            self.widget.parent = None
-            self.playground.add_widget_to_parent(self.widget, self.parent,
-                                                 from_undo=True,
-                                                 kv_str=self.kv_str)
+        offset, removed, inserted = self.delta
+        return self.kv_code_input.apply_delta(offset, inserted, removed,
+                                              self.text_hashes[1])
 
     def do_redo(self):
         '''Override of :class:`OperationBase`.do_redo.
-           This will redo a WidgetOperation.
+           Returns False if the change cannot be redone anymore.
         '''
+        offset, removed, inserted = self.delta
+        return self.kv_code_input.apply_delta(offset, removed, inserted,
+                                              self.text_hashes[0])
 
-        if self.widget_op_type == 'remove':
-            self.playground.remove_widget_from_parent(self.widget, True)
+    def get_size(self):
+        '''Override of :class:`OperationBase`.get_size.
+        '''
+        return OPERATION_SIZE + sys.getsizeof(self.delta[1]) + \
+            sys.getsizeof(self.delta[2])
 
-        else:
-            self.widget.parent = None
-            self.playground.add_widget_to_parent(self.widget, self.parent,
-                                                 from_undo=True,
-                                                 kv_str=self.kv_str)
 
+class WidgetOperation(KVOperation):
+    '''WidgetOperation class for widget operations of add and remove
+    '''
 
-class WidgetDragOperation(OperationBase):
+    def __init__(self, widget_op_type, kv_code_input, delta):
+        super(WidgetOperation, self).__init__('widget', kv_code_input, delta)
+        self.widget_op_type = widget_op_type
 
-    def __init__(self, widget, cur_parent, prev_parent, prev_index,
-                 playground, extra_args):
-        self.widget = widget
-        self.cur_parent = cur_parent
-        self.prev_parent = prev_parent
-        self.prev_index = prev_index
-        self.playground = playground
-        self.cur_index = extra_args['index']
-        self.extra_args = extra_args
 
-    def do_undo(self):
-        self.cur_parent.remove_widget(self.widget)
-        self.playground.drag_wigdet(self.widget, self.prev_parent,
-                                    extra_args={'index': self.prev_index,
-                                                'prev_index': self.cur_index,
-                                                'x': self.extra_args['prev_x'],
-                                                'y': self.extra_args['prev_y']},
-                                    from_undo=True)
+class WidgetDragOperation(KVOperation):
+    '''WidgetDragOperation class for moving a widget by dragging it
+    '''
 
-    def do_redo(self):
-        self.prev_parent.remove_widget(self.widget)
-        self.playground.drag_wigdet(self.widget, self.cur_parent,
-                                    extra_args={'index': self.cur_index,
-                                                'prev_index': self.prev_index,
-                                                'x': self.extra_args['x'],
-                                                'y': self.extra_args['y']},
-                                    from_undo=True)
+    def __init__(self, kv_code_input, delta):
+        super(WidgetDragOperation, self).__init__('drag', kv_code_input,
+                                                  delta)
 
 
-class PropOperation(OperationBase):
-    '''PropOperation class for Property Operations of changing property value
+class PropOperation(KVOperation):
+    '''PropOperation class for Property Operations of changing property value.
+       widget_path is the path of the changed widget from the root widget,
+       which identifies it even once it has been reloaded.
     '''
 
-    def __init__(self, prop, oldvalue, newvalue):
-        super(PropOperation, self).__init__('property')
-        self.prop = prop
-        self.oldvalue = oldvalue
-        self.newvalue = newvalue
-
-    def do_undo(self):
-        '''Override of :class:`OperationBase`.do_undo.
-           This will undo a PropOperation.
-        '''
-
-        setattr(self.prop.propwidget, self.prop.propname, self.oldvalue)
-        self._update_widget(self.oldvalue)
+    def __init__(self, propname, kv_code_input, delta, widget_path=None):
+        super(PropOperation, self).__init__('property', kv_code_input, delta)
+        self.propname = propname
+        self.widget_path = widget_path
 
-    def _update_widget(self, value):
-        '''After do_undo or do_redo, this function will update the PropWidget's
-           value associated with that property.
+    def merge(self, op):
+        '''Override of :class:`OperationBase`.merge. Changes of the same
+           property of the same widget are merged, so that typing a value is
+           undone at once.
         '''
-        self.prop.record_to_undo = False
-        if isinstance(self.prop, TextInput):
-            self.prop.text = value
-        elif isinstance(self.prop, CheckBox):
-            self.prop.active = value
+        if not isinstance(op, PropOperation) or \
+                op.propname != self.propname or \
+                op.widget_path is None or \
+                op.widget_path != self.widget_path:
+            return False
 
-    def do_redo(self):
-        '''Override of :class:`OperationBase`.do_redo.
-           This will redo a PropOperation.
-        '''
+        delta = merge_deltas(self.delta, op.delta)
+        if delta is None:
+            return False
 
-        setattr(self.prop.propwidget, self.prop.propname, self.newvalue)
-        self._update_widget(self.newvalue)
+        self.delta = delta
+        self.text_hashes = (self.text_hashes[0], op.text_hashes[1])
+        return True
 
 
 class UndoManager(object):
     '''UndoManager is reponsible for managing all the operations related
        to Widgets. It is also responsible for redoing and undoing the last
        available operation.
+
+       The history is bounded by max_entries operations and by max_size
+       bytes, as estimated by the operations, the oldest operations are
+       dropped to keep it within them. An operation pushed less than
+       merge_time seconds after the previous one is merged into it when
+       possible.
     '''
 
     def __init__(self, **kwargs):
         super(UndoManager, self).__init__(**kwargs)
         self._undo_stack_operation = []
         self._redo_stack_operation = []
+        self.max_entries = 100
+        self.max_size = 16 * 1024 * 1024
+        self.merge_time = 1.0
+        self._sizes = {}
+        self._size = 0
+        self._last_push_time = None
+        self._evicted = 0
+        self._merged = 0
+
+    def _add_size(self, op):
+        size = op.get_size()
+        self._size += size - self._sizes.get(id(op), 0)
+        self._sizes[id(op)] = size
+
+    def _remove_size(self, op):
+        self._size -= self._sizes.pop(id(op), 0)
 
     def push_operation(self, op):
-        '''To push an operation into _undo_stack.
+        '''To push an operation into _undo_stack. Operations which have
+           been undone cannot be redone anymore, they are dropped.
         '''
         App.get_running_app().root._curr_proj_changed = True
+        now = time.time()
+        last_push_time = self._last_push_time
+        self._last_push_time = now
+        if self._undo_stack_operation and last_push_time is not None and \
+                now - last_push_time <= self.merge_time:
+            last_op = self._undo_stack_operation[-1]
+            if last_op.merge(op):
+                self._add_size(last_op)
+                self._merged += 1
+                return
+
+        for redo_op in self._redo_stack_operation:
+            self._remove_size(redo_op)
+        self._redo_stack_operation = []
+
         self._undo_stack_operation.append(op)
+        self._add_size(op)
+        self.evict()
+
+    def set_limits(self, max_entries=None, max_size=None):
+        '''To set the maximum number of operations and the maximum size, in
+           bytes, of the history, and drop the operations exceeding them.
+        '''
+        if max_entries is not None:
+            self.max_entries = max_entries
+
+        if max_size is not None:
+            self.max_size = max_size
+
+        self.evict()
+
+    def evict(self):
+        '''To drop the oldest operations which can be undone until the
+           history is within its limits. The last one is always kept.
+        '''
+        undo_stack = self._undo_stack_operation
+        redo_stack = self._redo_stack_operation
+        while len(undo_stack) > 1 and \
+                (len(undo_stack) + len(redo_stack) > self.max_entries or
+                 self._size > self.max_size):
+            op = undo_stack.pop(0)
+            self._remove_size(op)
+            self._evicted += 1
+
+    def stats(self):
+        '''Returns a dict describing the history: the number of operations
+           which can be undone and redone, their estimated size in bytes,
+           the limits and the number of operations dropped and merged.
+        '''
+        return {'undo_entries': len(self._undo_stack_operation),
+                'redo_entries': len(self._redo_stack_operation),
+                'size': self._size,
+                'max_entries': self.max_entries,
+                'max_size': self.max_size,
+                'evicted': self._evicted,
+                'merged': self._merged}
 
     def do_undo(self):
         '''To undo last operation
@@ -150,8 +261,13 @@ class UndoManager(object):
         if self._undo_stack_operation == []:
             return
 
+        self._last_push_time = None
         operation = self._undo_stack_operation.pop()
-        operation.do_undo()
+        if operation.do_undo() is False:
+            # Text has been changed since, operation is dropped
+            self._remove_size(operation)
+            return
+
         self._redo_stack_operation.append(operation)
 
     def do_redo(self):
@@ -161,8 +277,12 @@ class UndoManager(object):
         if self._redo_stack_operation == []:
             return
 
+        self._last_push_time = None
         operation = self._redo_stack_operation.pop()
-        operation.do_redo()
+        if operation.do_redo() is False:
+            self._remove_size(operation)
+            return
+
         self._undo_stack_operation.append(operation)
 
     def cleanup(self):
@@ -170,3 +290,6 @@ class UndoManager(object):
         '''
         self._undo_stack_operation = []
         self._redo_stack_operation = []
+        self._sizes = {}
+        self._size = 0
+        self._last_push_time = None
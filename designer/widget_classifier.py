@@ -0,0 +1,111 @@
+'''This module contains WidgetClassifier, which tells of which kind a class
+   of widget is, e.g. if it is a custom or a complex widget, with set
+   lookups instead of looping over :data:`designer.common.widgets` and over
+   the class rules of the project for every widget checked.
+'''
+
+from designer.common import widgets as common_widgets
+
+
+class WidgetClassifier(object):
+    '''WidgetClassifier classifies widgets by the name of their class. It
+       is built from widgets, a list in the format of
+       :data:`designer.common.widgets`, and from the class rules of the
+       project. It must be refreshed whenever one of them changes, which
+       is done by its methods changing them.
+    '''
+
+    def __init__(self, widgets=common_widgets):
+        super(WidgetClassifier, self).__init__()
+        self.widgets = widgets
+        self._categories = {}
+        self._rules = {}
+        self.refresh()
+
+    def refresh(self):
+        '''To build the sets of the names of the widgets of each category
+           again from self.widgets.
+        '''
+
+        categories = {}
+        for widget in self.widgets:
+            categories.setdefault(widget[1], set()).add(widget[0])
+
+        self._categories = categories
+
+    def set_class_rules(self, class_rules):
+        '''To set the class rules of the project.
+        '''
+
+        rules = {}
+        for rule in class_rules:
+            rules.setdefault(rule.name, rule)
+
+        self._rules = rules
+
+    def add_custom(self, rules):
+        '''To add the classes of rules to self.widgets in the 'custom'
+           category.
+        '''
+
+        for rule in rules:
+            self.widgets.append((rule.name, 'custom'))
+
+        self.refresh()
+
+    def remove_custom(self):
+        '''To remove all the widgets of the 'custom' category from
+           self.widgets.
+        '''
+
+        self.widgets[:] = [widget for widget in self.widgets
+                           if widget[1] != 'custom']
+        self.refresh()
+
+    def get_names(self, category):
+        '''Returns the sorted list of the names of the widgets of category.
+        '''
+
+        return sorted(self._categories.get(category, ()))
+
+    def is_category(self, name, category):
+        '''Returns True if name is the name of a widget of category.
+        '''
+
+        return name in self._categories.get(category, ())
+
+    def is_custom(self, name):
+        '''Returns True if name is the name of a widget of the 'custom'
+           category.
+        '''
+
+        return self.is_category(name, 'custom')
+
+    def is_complex(self, name):
+        '''Returns True if name is the name of a widget of the 'complex'
+           category.
+        '''
+
+        return self.is_category(name, 'complex')
+
+    def has_rule(self, name):
+        '''Returns True if the project has a class rule for name.
+        '''
+
+        return name in self._rules
+
+    def get_rule(self, name):
+        '''Returns the first class rule of the project for name, None if
+           there is none.
+        '''
+
+        return self._rules.get(name)
+
+    def hides_children(self, widget):
+        '''Returns True if the children of widget are part of it and not
+           edited on their own, i.e. widget has a class rule or it is a
+           complex widget.
+        '''
+
+        name = type(widget).__name__
+        return name in self._rules or self.is_complex(name)